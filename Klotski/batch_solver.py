@@ -0,0 +1,152 @@
+# 批量求解文件
+# 同一关卡布局的大量变体（棋盘大小、墙体和目标点相同，方块不同）按几何分组，
+# 每组只计算一次起点到终点的通路（块割点树），关卡交给进程池并行求解，
+# 结果按输入顺序以生成器的形式逐个返回。移动表（move_tables）在求解时按需填充，
+# 缓存在各个工作进程中：每个进程为每种几何各建立一份，之后同几何的关卡直接复用
+#
+# 命令行用法：python batch_solver.py levels/*.json [--engine astar] [--workers 4]
+import io
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from board import Board, WALL
+from board_analysis import find_corridor_cells
+
+# 可选的求解引擎：bfs为solver.Solver（保证最短），astar为correct_solver.solve_puzzle
+ENGINES = ("bfs", "astar")
+
+
+def geometry_key(board: Board):
+    # 几何：棋盘大小、墙体位置和目标点，与方块无关
+    walls = frozenset((i, j) for i, row in enumerate(board.cells) for j, value in enumerate(row) if value == WALL)
+    return board.rows, board.cols, walls, tuple(board.targets)
+
+
+class Geometry:
+    """同一几何的一组关卡及其共用的预计算结果"""
+    def __init__(self, index: int, board: Board):
+        self.index = index
+        self.key = geometry_key(board)
+        # 起点到终点通路上可能出现的格子，只取决于墙体和目标点
+        self.corridor = frozenset(find_corridor_cells(board.cells, board.start_point, board.end_point))
+        # 属于该几何的关卡在输入中的序号
+        self.members: List[int] = []
+
+
+def group_by_geometry(boards: List[Board]) -> List[Geometry]:
+    """
+    按几何分组，每组只做一次预计算
+    :param boards: 棋盘列表
+    :return: 几何分组列表，按首次出现的顺序排列
+    """
+    groups = {}
+    for index, board in enumerate(boards):
+        key = geometry_key(board)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = Geometry(len(groups), board)
+        group.members.append(index)
+    return list(groups.values())
+
+
+def solve_one(engine: str, cells: List[List[int]], targets, corridor, state_limit: Optional[int]) -> Dict:
+    """
+    求解单个关卡，在工作进程或本进程中执行
+    :param engine: 求解引擎，见ENGINES
+    :param cells: 棋盘格子（99为墙体）
+    :param targets: 起点和终点
+    :param corridor: 该几何共用的通路格子
+    :param state_limit: 访问状态数上限，只对bfs有效
+    :return: {"solution", "limit_reached", "stats", "solve_time"}
+    """
+    board = Board(len(cells), len(cells[0]), [list(row) for row in cells], targets)
+    if engine == "bfs":
+        from solver import Solver
+        solver = Solver(board, state_limit=state_limit, corridor=corridor)
+        solution = solver.solve()
+        return {"solution": solution, "limit_reached": solver.limit_reached,
+                "stats": solver.stats, "solve_time": solver.get_solve_time()}
+    from correct_solver import solve_puzzle
+    # correct_solver中墙体为-1；批量求解时不打印每个关卡的性能分析
+    astar_board = [[-1 if value == WALL else value for value in row] for row in board.cells]
+    with contextlib.redirect_stdout(io.StringIO()):
+        path, _, duration, expanded, opened = solve_puzzle(astar_board, board.start_point, board.end_point,
+                                                           corridor=corridor)
+    return {"solution": path, "limit_reached": False,
+            "stats": {"expanded": expanded, "opened": opened}, "solve_time": duration}
+
+
+def iter_solve_batch(boards: Iterable[Board], engine: str = "bfs", workers: Optional[int] = None,
+                     state_limit: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    批量求解，按输入顺序逐个返回结果（前面的关卡求解完即可取得，不必等全部完成）
+    :param boards: 棋盘
+    :param engine: 求解引擎，见ENGINES
+    :param workers: 工作进程数，默认CPU核数；为1时在本进程内依次求解
+    :param state_limit: 单个关卡的访问状态数上限（只对bfs有效）
+    :return: 生成(输入序号, 结果)，结果见solve_one，另含"geometry"（几何分组编号）
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"未知的求解引擎: {engine}，可选值: {ENGINES}")
+    boards = list(boards)
+    groups = group_by_geometry(boards)
+    geometry_of = {index: group for group in groups for index in group.members}
+
+    def task_args(index):
+        board = boards[index]
+        return engine, board.cells, board.targets, geometry_of[index].corridor, state_limit
+
+    if workers == 1:
+        for index in range(len(boards)):
+            yield index, dict(solve_one(*task_args(index)), geometry=geometry_of[index].index)
+        return
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # 按几何分组提交，同组关卡相邻执行，工作进程中该几何的移动表缓存保持命中
+        futures = {}
+        for group in groups:
+            for index in group.members:
+                futures[index] = executor.submit(solve_one, *task_args(index))
+        for index in range(len(boards)):
+            yield index, dict(futures.pop(index).result(), geometry=geometry_of[index].index)
+    finally:
+        # 调用方提前停止迭代（或出错）时不再需要其余结果：取消还未开始的关卡，并结束正在求解的工作进程，
+        # 不等待它们求解完（ProcessPoolExecutor没有公开的进程列表）；全部完成时工作进程都已空闲
+        processes = list(executor._processes.values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        executor.shutdown()
+
+
+def solve_batch(boards: Iterable[Board], engine: str = "bfs", workers: Optional[int] = None,
+                state_limit: Optional[int] = None) -> List[Dict]:
+    # 批量求解，返回与输入顺序一致的结果列表
+    return [result for _, result in iter_solve_batch(boards, engine, workers, state_limit)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量求解关卡，按几何共用预计算")
+    parser.add_argument("levels", nargs="+", help="关卡JSON文件")
+    parser.add_argument("--engine", choices=ENGINES, default="bfs", help="求解引擎")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认CPU核数")
+    parser.add_argument("--state-limit", type=int, default=None, help="单题BFS状态数上限")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    boards = []
+    for path in args.levels:
+        with open(path, "r") as f:
+            boards.append(Board.from_level(json.load(f)))
+    geometries = set()
+    for index, result in iter_solve_batch(boards, args.engine, args.workers, args.state_limit):
+        geometries.add(result["geometry"])
+        solution = result["solution"]
+        moves = "无解" if solution is None else f"{len(solution)} 步"
+        if result["limit_reached"]:
+            moves = "超过状态数上限"
+        print(f"{args.levels[index]}: {moves}，用时 {result['solve_time']:.3f} 秒，几何分组 {result['geometry']}")
+    print(f"共 {len(boards)} 个关卡，{len(geometries)} 种几何，总耗时 {time.time() - start_time:.2f} 秒")
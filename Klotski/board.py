@@ -0,0 +1,47 @@
+# 纯数据棋盘模型文件
+# 不依赖pygame，求解器等无界面模块只通过该模型读取棋盘
+from typing import List, Tuple, Optional
+
+# 墙体在棋盘中的表示
+WALL = 99
+
+
+class Board:
+    def __init__(self, rows: int, cols: int, cells: List[List[int]] = None, targets=None):
+        self.rows = rows
+        self.cols = cols
+        # 棋盘格子，0代表空位，99代表墙体，其余为方块编号
+        if cells is None:
+            cells = [[0 for _ in range(cols)] for _ in range(rows)]
+        self.cells = cells
+        # 目标点统一转换为元组，避免从JSON读取的列表与元组比较失败
+        if targets:
+            self.targets = [tuple(point) for point in targets]
+        else:
+            # 初始默认左上角为起点，右下角为终点
+            self.targets = [(0, 0), (rows - 1, cols - 1)]
+
+    @property
+    def start_point(self) -> Optional[Tuple[int, int]]:
+        # 起点
+        return self.targets[0] if self.targets else None
+
+    @property
+    def end_point(self) -> Optional[Tuple[int, int]]:
+        # 终点
+        return self.targets[1] if len(self.targets) > 1 else None
+
+    def get_state(self):
+        # 获取当前棋盘状态（用于求解器）
+        return tuple(tuple(row) for row in self.cells)
+
+    @classmethod
+    def from_level(cls, level: dict) -> "Board":
+        """
+        根据关卡数据创建棋盘模型
+        :param level: 关卡字典，格式与levels目录下的JSON文件一致
+        :return: 棋盘模型
+        """
+        rows, cols = level["board_size"]
+        cells = [list(row) for row in level["board"]]
+        return cls(rows, cols, cells, level.get("targets"))
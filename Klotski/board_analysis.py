@@ -0,0 +1,195 @@
+# 棋盘静态分析文件
+# 搜索开始前只根据墙体和棋盘边界分析每个方块的活动范围（忽略其他方块），
+# 求解器据此跳过永远无法移动的方块，只尝试方块实际能使用的方向，
+# 并固定与起点到终点通路无关的方块
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+# 墙体的两种表示：Board/Game中为99，correct_solver中为-1
+WALL_VALUES = (99, -1)
+# 四个移动方向的(行偏移, 列偏移)
+OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def is_wall(value: int) -> bool:
+    # 判断格子是否为墙体
+    return value in WALL_VALUES
+
+
+def find_block_positions(state) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    获取所有方块的位置（不含空位和墙体）
+    :param state: 棋盘状态（二维列表或元组）
+    :return: 方块编号 -> 按行优先排列的位置列表
+    """
+    positions = {}
+    for i, row in enumerate(state):
+        for j, value in enumerate(row):
+            if value != 0 and not is_wall(value):
+                positions.setdefault(value, []).append((i, j))
+    return positions
+
+
+def get_reachable_offsets(state, positions: List[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+    """
+    忽略其他方块，求方块通过逐格平移能到达的所有位移
+    :param state: 棋盘状态
+    :param positions: 方块当前的所有位置
+    :return: 可到达的(行位移, 列位移)集合，包含(0, 0)
+    """
+    rows, cols = len(state), len(state[0])
+
+    def fits(di, dj):
+        # 平移后的每个格子都在棋盘内且不是墙体
+        for i, j in positions:
+            ni, nj = i + di, j + dj
+            if not (0 <= ni < rows and 0 <= nj < cols) or is_wall(state[ni][nj]):
+                return False
+        return True
+
+    reachable = {(0, 0)}
+    queue = deque([(0, 0)])
+    while queue:
+        di, dj = queue.popleft()
+        for oi, oj in OFFSETS:
+            offset = (di + oi, dj + oj)
+            if offset not in reachable and fits(*offset):
+                reachable.add(offset)
+                queue.append(offset)
+    return reachable
+
+
+def get_usable_offsets(reachable: Set[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    根据可到达的位移求方块可能用到的移动方向
+    :param reachable: get_reachable_offsets的结果
+    :return: 至少在一个可到达位置上能够使用的方向偏移列表；为空表示方块永远无法移动
+    """
+    return [(oi, oj) for oi, oj in OFFSETS
+            if any((di + oi, dj + oj) in reachable for di, dj in reachable)]
+
+
+def analyze_block_mobility(state) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    静态分析每个方块可以使用的移动方向
+    只有墙体和棋盘边界会限制方块，结果对整个搜索过程有效
+    :param state: 初始棋盘状态
+    :return: 方块编号 -> 可用方向偏移列表（无法移动的方块为空列表）
+    """
+    return {block: get_usable_offsets(get_reachable_offsets(state, positions))
+            for block, positions in find_block_positions(state).items()}
+
+
+def _passable_neighbors(state, cell: Tuple[int, int]):
+    # 四连通的非墙体相邻格子
+    rows, cols = len(state), len(state[0])
+    i, j = cell
+    for oi, oj in OFFSETS:
+        ni, nj = i + oi, j + oj
+        if 0 <= ni < rows and 0 <= nj < cols and not is_wall(state[ni][nj]):
+            yield ni, nj
+
+
+def _biconnected_components(state, root: Tuple[int, int]) -> List[Set[Tuple[int, int]]]:
+    # 非递归Tarjan算法：求root所在连通区域（只排除墙体）的所有双连通分量
+    disc = {root: 0}
+    low = {root: 0}
+    components = []
+    edge_stack = []
+    stack = [(root, None, _passable_neighbors(state, root))]
+    while stack:
+        v, parent, neighbors = stack[-1]
+        advanced = False
+        for w in neighbors:
+            if w not in disc:
+                disc[w] = low[w] = len(disc)
+                edge_stack.append((v, w))
+                stack.append((w, v, _passable_neighbors(state, w)))
+                advanced = True
+                break
+            if w != parent and disc[w] < disc[v]:
+                low[v] = min(low[v], disc[w])
+                edge_stack.append((v, w))
+        if advanced:
+            continue
+        stack.pop()
+        if stack:
+            u = stack[-1][0]
+            low[u] = min(low[u], low[v])
+            if low[v] >= disc[u]:
+                # u是割点（或根），弹出u-v边及其之后的所有边组成一个双连通分量
+                component = set()
+                while True:
+                    edge = edge_stack.pop()
+                    component.update(edge)
+                    if edge == (u, v):
+                        break
+                components.append(component)
+    return components
+
+
+def find_corridor_cells(state, start: Tuple[int, int], goal: Tuple[int, int]) -> Set[Tuple[int, int]]:
+    """
+    求可能出现在起点到终点通路上的所有格子（只考虑墙体，方块都可能被移开）
+    这些格子恰好是块割点树中起点到终点路径上的双连通分量的并集
+    :param state: 棋盘状态
+    :param start: 起点
+    :param goal: 终点
+    :return: 通路格子集合；起点和终点被墙体隔开时为空集合
+    """
+    if is_wall(state[start[0]][start[1]]) or is_wall(state[goal[0]][goal[1]]):
+        return set()
+    if start == goal:
+        return {start}
+    components = _biconnected_components(state, start)
+    # 共享割点的分量在块割点树中相邻；从包含起点的分量出发BFS到包含终点的分量
+    owners = {}
+    for index, component in enumerate(components):
+        for cell in component:
+            owners.setdefault(cell, []).append(index)
+    previous = {index: None for index in owners.get(start, [])}
+    queue = deque(previous)
+    while queue:
+        index = queue.popleft()
+        if goal in components[index]:
+            corridor = set()
+            while index is not None:
+                corridor |= components[index]
+                index = previous[index]
+            return corridor
+        for cell in components[index]:
+            for neighbor in owners[cell]:
+                if neighbor not in previous:
+                    previous[neighbor] = index
+                    queue.append(neighbor)
+    return set()
+
+
+def find_relevant_blocks(state, start: Tuple[int, int], goal: Tuple[int, int],
+                         corridor: Optional[Set[Tuple[int, int]]] = None) -> Set[int]:
+    """
+    求可能影响起点到终点通路的方块
+    方块的扫掠区域（忽略其他方块时能覆盖的所有格子）与通路相交时直接相关；
+    与相关方块的扫掠区域相交时可能挡住或让开该方块，也是相关的。
+    其余方块无论怎样移动都不影响结果，求解时可以固定不动
+    :param state: 初始棋盘状态
+    :param start: 起点
+    :param goal: 终点
+    :param corridor: 预先算好的find_corridor_cells结果（只取决于墙体和目标点，同一几何的关卡可共用）
+    :return: 相关方块编号集合
+    """
+    if corridor is None:
+        corridor = find_corridor_cells(state, start, goal)
+    regions = {}
+    for block, positions in find_block_positions(state).items():
+        offsets = get_reachable_offsets(state, positions)
+        regions[block] = {(i + di, j + dj) for i, j in positions for di, dj in offsets}
+    relevant = {block for block, region in regions.items() if not region.isdisjoint(corridor)}
+    queue = deque(relevant)
+    while queue:
+        region = regions[queue.popleft()]
+        for block, other in regions.items():
+            if block not in relevant and not other.isdisjoint(region):
+                relevant.add(block)
+                queue.append(block)
+    return relevant
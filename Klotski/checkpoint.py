@@ -0,0 +1,106 @@
+# 检查点文件
+# 长时间求解时定期把搜索进度（待扩展队列、已访问结构和统计信息）保存到磁盘，
+# 进程被抢占后重新求解同一关卡时从最近的检查点继续。
+# 格式为zlib压缩的pickle；先写临时文件再原子替换，写到一半被中断也不会损坏已有的检查点
+import os
+import pickle
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+# 检查点格式版本，格式变化后旧检查点直接忽略
+CHECKPOINT_VERSION = 1
+# 默认保存间隔（秒）
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+# zlib压缩级别：搜索状态中大量重复的行元组已由pickle去重，低级别压缩即可明显减小体积
+CHECKPOINT_COMPRESSION = 1
+
+
+def save_checkpoint(path: str, key, payload: Any) -> int:
+    """
+    保存检查点
+    :param path: 检查点文件路径
+    :param key: 求解任务的标识（求解器类型、初始状态、目标点和求解选项），恢复时必须一致
+    :param payload: 搜索进度，必须能被pickle
+    :return: 写入的字节数
+    """
+    data = zlib.compress(pickle.dumps({"version": CHECKPOINT_VERSION, "key": key, "payload": payload},
+                                      pickle.HIGHEST_PROTOCOL), CHECKPOINT_COMPRESSION)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return len(data)
+
+
+def load_checkpoint(path: str, key) -> Optional[Any]:
+    """
+    读取检查点
+    :param path: 检查点文件路径
+    :param key: 当前求解任务的标识
+    :return: 搜索进度；文件不存在、已损坏、版本不符或属于其他求解任务时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            record = pickle.loads(zlib.decompress(f.read()))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+        print(f"读取检查点 {path} 失败，重新开始搜索: {e}")
+        return None
+    if record.get("version") != CHECKPOINT_VERSION or record.get("key") != key:
+        print(f"检查点 {path} 不属于当前求解任务，重新开始搜索")
+        return None
+    return record["payload"]
+
+
+def remove_checkpoint(path: str):
+    # 求解结束后删除检查点（包括残留的临时文件）
+    for name in (path, path + ".tmp"):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+class Checkpointer:
+    """
+    按时间间隔保存检查点，并把保存次数、耗时和大小记录到求解器的统计信息中：
+      checkpoint_count  已保存的次数（恢复后继续累计）
+      checkpoint_time   保存检查点花费的总时间（秒），即检查点的开销
+      checkpoint_bytes  最近一次检查点的大小
+      resumed           本次求解是否从检查点恢复
+    """
+    def __init__(self, path: str, key, interval: float = DEFAULT_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.key = key
+        self.interval = interval
+        self.last_save = time.monotonic()
+
+    @staticmethod
+    def init_stats(stats: Dict):
+        stats.update({"checkpoint_count": 0, "checkpoint_time": 0.0, "checkpoint_bytes": 0, "resumed": False})
+
+    def due(self) -> bool:
+        # 距上次保存（或开始搜索）已超过间隔
+        return time.monotonic() - self.last_save >= self.interval
+
+    def save(self, payload: Any, stats: Dict):
+        """
+        保存检查点；payload中包含stats时，保存的统计信息已计入本次保存
+        :param payload: 搜索进度
+        :param stats: 求解器的统计信息，更新其中的检查点字段
+        """
+        save_start = time.monotonic()
+        stats["checkpoint_count"] += 1
+        stats["checkpoint_bytes"] = save_checkpoint(self.path, self.key, payload)
+        self.last_save = time.monotonic()
+        stats["checkpoint_time"] += self.last_save - save_start
+
+    def load(self) -> Optional[Any]:
+        payload = load_checkpoint(self.path, self.key)
+        self.last_save = time.monotonic()
+        return payload
+
+    def clear(self):
+        remove_checkpoint(self.path)
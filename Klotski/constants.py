@@ -11,6 +11,9 @@ GAME_TITLE = "华容道游戏"
 # 菜单选项
 MENU_OPTIONS = ["出题模式", "解题模式", "退出游戏"]
 
+# 选关界面一屏显示的关卡数量
+VISIBLE_LEVEL_COUNT = 6
+
 # 棋盘默认设置
 DEFAULT_BOARD_SIZE = (5, 5)
 CELL_SIZE = 80
@@ -60,6 +63,11 @@ TEXT_MESSAGES = {
     "NO_LEVELS": "题库为空"
 }
 
+# 需要整屏重绘的窗口事件（窗口被遮挡、恢复等）
+REDRAW_EVENTS = tuple(getattr(pygame, name) for name in
+                      ("VIDEOEXPOSE", "WINDOWEXPOSED", "WINDOWRESTORED", "WINDOWSHOWN")
+                      if hasattr(pygame, name))
+
 # 方向映射
 DIRECTION_MAP = {
     "up": "上",
@@ -68,11 +76,23 @@ DIRECTION_MAP = {
     "right": "右"
 }
 
+# 方向对应的行列偏移
+DIRECTION_OFFSETS = {
+    "up": (-1, 0),
+    "down": (1, 0),
+    "left": (0, -1),
+    "right": (0, 1)
+}
+
 # 字体设置
-def get_font(size=36):
+FONT_NAMES = ("SimHei", "Microsoft YaHei", "WenQuanYi Micro Hei")
+DEFAULT_FONT_SIZE = 36
+SIDEBAR_FONT_SIZE = 24
+
+def get_font(size=DEFAULT_FONT_SIZE, names=FONT_NAMES):
     """获取支持中文的字体"""
     try:
-        return pygame.font.SysFont(["SimHei", "Microsoft YaHei", "WenQuanYi Micro Hei"], size)
+        return pygame.font.SysFont(list(names), size)
     except:
         return pygame.font.Font(None, size)
 
@@ -99,6 +119,7 @@ HELP_TEXTS = {
         "Q键: 设置起点",
         "E键: 设置终点",
         "ESC: 返回菜单",
-        "S键: 自动求解"
+        "S键: 自动求解",
+        "H键: 下一步提示"
     ]
 }
\ No newline at end of file
@@ -1,7 +1,18 @@
 # 在文件开头导入必要的库
 import time
+import json
 import heapq
+import argparse
+from array import array
+from operator import itemgetter
 from collections import deque, defaultdict
+from zobrist import ZobristTable, ZobristMap
+from board_analysis import analyze_block_mobility, find_relevant_blocks
+from move_order import is_redundant
+from move_tables import get_move_table, apply_table_move
+from checkpoint import Checkpointer, DEFAULT_CHECKPOINT_INTERVAL
+from progress import ProgressReporter, DEFAULT_PROGRESS_INTERVAL, run_to_result, format_progress
+from memory_profile import MemoryProfiler, format_memory_stats
 import cProfile
 import pstats
 from io import StringIO
@@ -23,19 +34,45 @@ def find_blocks(board):
                 blocks[board[i][j]].append((i, j))
     return blocks
 
-def find_all_paths(board, start, goal):
-    """找到所有可能的路径"""
+# 通道数上限：最短路径的条数随棋盘大小呈指数增长（开阔的6x6棋盘上已有数百条），只取前若干条
+MAX_CORRIDOR_PATHS = 64
+
+def find_all_paths(board, start, goal, limit=MAX_CORRIDOR_PATHS):
+    """
+    找到起点到终点只经过空格的最短路径（至多limit条）
+    先从终点做一次BFS得到各空格到终点的距离，再只沿距离减1的方向枚举，
+    每条分支都一定能走到终点，代价与路径数×路径长度成正比，不会枚举所有简单路径
+    """
     m, n = len(board), len(board[0])
+    start, goal = tuple(start), tuple(goal)
+    if start != goal and board[goal[0]][goal[1]] != 0:
+        return []
+    dist = {goal: 0}
+    queue = deque([goal])
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == start:
+            # 起点可以被方块占据，只作为路径的端点，不继续扩展
+            continue
+        for dx, dy in [(0,1), (0,-1), (1,0), (-1,0)]:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < m and 0 <= ny < n and (nx, ny) not in dist and (board[nx][ny] == 0 or (nx, ny) == start):
+                dist[(nx, ny)] = dist[(x, y)] + 1
+                queue.append((nx, ny))
+    if start not in dist:
+        return []
     paths = []
-    def dfs(x, y, path):
+    stack = [[start]]
+    while stack and len(paths) < limit:
+        path = stack.pop()
+        x, y = path[-1]
         if (x, y) == goal:
             paths.append(path)
-            return
-        for dx, dy in [(0,1), (0,-1), (1,0), (-1,0)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < m and 0 <= ny < n and board[nx][ny] == 0:
-                dfs(nx, ny, path + [(nx, ny)])
-    dfs(start[0], start[1], [start])
+            continue
+        for dx, dy in [(-1,0), (1,0), (0,-1), (0,1)]:
+            nxt = (x + dx, y + dy)
+            if dist.get(nxt) == dist[(x, y)] - 1:
+                stack.append(path + [nxt])
     return paths
 
 def remove_suboptimal_paths(paths):
@@ -97,10 +134,11 @@ def can_move(block_cells, dx, dy, board):
             return False
     return True
 
-def move_block(block_id, dx, dy, board):
-    """执行移动，返回新棋盘"""
+def move_block(block_id, dx, dy, board, cells=None):
+    """执行移动，返回新棋盘；已知方块位置时通过cells传入，省去扫描棋盘"""
     new_board = [row[:] for row in board]
-    cells = [(i, j) for i in range(len(board)) for j in range(len(board[0])) if board[i][j] == block_id]
+    if cells is None:
+        cells = [(i, j) for i in range(len(board)) for j in range(len(board[0])) if board[i][j] == block_id]
     for x, y in cells:
         new_board[x][y] = 0
     for x, y in cells:
@@ -178,6 +216,267 @@ def calculate_cost(path, board):
             cost += 1
     return cost
 
+# ================= 通道位掩码 =================
+# 格子(i, j)对应第 i*列数+j 位，与移动表（move_tables）的编码一致
+class CorridorMasks:
+    """
+    把valid_paths预编译为位掩码，状态只需携带占用掩码（非0格子）：
+    某条通道与占用掩码按位与为0即存在空路径；启发值按每个方块的位掩码统计挡住通道的方块数
+    """
+    def __init__(self, board, start, goal, paths):
+        m, n = len(board), len(board[0])
+        self.cols = n
+        self.full = (1 << (m * n)) - 1
+        # 左移一位（列号加1）后不能落在第0列，右移一位后不能落在最后一列，防止跨行
+        first_col = sum(1 << (i * n) for i in range(m))
+        self.not_first_col = self.full & ~first_col
+        self.not_last_col = self.full & ~(first_col << (n - 1))
+        self.start_bit = 1 << (start[0] * n + start[1])
+        self.goal_bit = 1 << (goal[0] * n + goal[1])
+        self.corridors = [self.cells_mask(path) for path in paths]
+        # 非墙体格子（墙体为-1，也兼容Board中的99）
+        self.open_cells = self.full & ~self.cells_mask(
+            [(i, j) for i, row in enumerate(board) for j, value in enumerate(row) if value in (-1, 99)])
+        # (方块编号, 方块首格位置) -> 方块掩码；方块形状固定，首格位置确定了全部格子
+        self.block_cache = {}
+
+    def cells_mask(self, cells):
+        n = self.cols
+        return sum(1 << (i * n + j) for i, j in set(cells))
+
+    def occupancy(self, board):
+        # 占用掩码：墙体和方块占据的格子
+        n = self.cols
+        return sum(1 << (i * n + j) for i, row in enumerate(board) for j, value in enumerate(row) if value != 0)
+
+    def block_masks(self, blocks):
+        # 方块编号 -> 方块占据格子的位掩码；没有通道时启发值恒为无穷大，不需要计算
+        if not self.corridors:
+            return {}
+        cache = self.block_cache
+        result = {}
+        for block_id, cells in blocks.items():
+            key = (block_id, cells[0])
+            mask = cache.get(key)
+            if mask is None:
+                mask = cache[key] = self.cells_mask(cells)
+            result[block_id] = mask
+        return result
+
+    def is_goal(self, occupied):
+        """
+        与empty_path_exists等价的目标检测：先检查预编译的通道，
+        都被挡住时再在空格掩码上做位运算洪泛，保证结果精确
+        """
+        for corridor in self.corridors:
+            if not corridor & occupied:
+                return True
+        free = self.full & ~occupied
+        if not (free & self.start_bit and free & self.goal_bit):
+            return False
+        return bool(self.flood(self.start_bit, free) & self.goal_bit)
+
+    def spread(self, cells):
+        # 所有格子向四个方向各扩展一格
+        n = self.cols
+        return (cells | (cells << n) | (cells >> n)
+                | ((cells << 1) & self.not_first_col) | ((cells >> 1) & self.not_last_col)) & self.full
+
+    def flood(self, seed, passable):
+        # 从seed出发、只经过passable中的格子能到达的所有格子（seed本身总是包含在内）
+        reach = seed
+        while True:
+            grown = (self.spread(reach) & passable) | seed
+            if grown == reach:
+                return reach
+            reach = grown
+
+    def blocked_cells(self, occupied):
+        """
+        起点到终点的所有路径中，被方块占据的格子数的最小值（墙体不可通过），
+        按"经过不超过k个被占格子能到达的区域"逐层扩展，每层只做位运算洪泛；
+        按格子而不是按方块计数（与heuristic不同）：路径穿过同一方块的多个格子时重复计入
+        :param occupied: 占用掩码
+        :return: 最少被占格子数，目标状态为0，起点和终点被墙体隔开时为无穷大
+        """
+        if not self.goal_bit & self.open_cells or not self.start_bit & self.open_cells:
+            return float('inf')
+        free = self.full & ~occupied
+        seed = self.start_bit
+        cost = 0 if seed & free else 1
+        reach = self.flood(seed, free)
+        while not reach & self.goal_bit:
+            # 再多经过一个被占格子
+            grown = self.flood(self.spread(reach) & self.open_cells | reach, free)
+            if grown == reach:
+                return float('inf')
+            reach = grown
+            cost += 1
+        return cost
+
+    def blocking_cost(self, block_masks, moved_block=0, changed_mask=0):
+        """
+        与heuristic等价：各条通道上需要清理的方块数的最小值
+        :param block_masks: 移动前的方块编号 -> 位掩码
+        :param moved_block: 刚移动的方块（省去复制整个字典），0表示没有移动
+        :param changed_mask: 移动的TableMove.changed_mask
+        :return: 最小清理代价，没有通道时为无穷大
+        """
+        cost = float('inf')
+        if not self.corridors:
+            return cost
+        moved_mask = block_masks[moved_block] ^ changed_mask if moved_block else 0
+        for corridor in self.corridors:
+            # 挡住通道的方块集合记为以方块编号为位的掩码，代价为其中1的个数
+            hit = 1 << moved_block if moved_mask & corridor else 0
+            for block_id, mask in block_masks.items():
+                if mask & corridor and block_id != moved_block:
+                    hit |= 1 << block_id
+            cost = min(cost, bin(hit).count("1"))
+        return cost
+
+# ================= 桶式优先队列 =================
+# 桶内同f值节点的出队顺序：deep优先弹出g最大（更深）的节点，shallow优先弹出g最小的节点
+TIE_BREAKS = ("deep", "shallow")
+
+class _Bucket:
+    """同一f值的节点，按g分层存放"""
+    __slots__ = ("layers", "cursor", "count")
+
+    def __init__(self):
+        self.layers = []     # g -> 该层节点列表
+        self.cursor = None   # 下一个待检查的g层
+        self.count = 0
+
+    def push(self, g, item, deep):
+        while len(self.layers) <= g:
+            self.layers.append([])
+        self.layers[g].append(item)
+        if self.cursor is None or (g > self.cursor if deep else g < self.cursor):
+            self.cursor = g
+        self.count += 1
+
+    def pop(self, deep):
+        # deep时游标不小于任何非空层，shallow时不大于任何非空层，只需单向移动
+        step = -1 if deep else 1
+        while not self.layers[self.cursor]:
+            self.cursor += step
+        g = self.cursor
+        item = self.layers[g].pop()
+        self.count -= 1
+        if self.count == 0:
+            self.cursor = None
+        return g, item
+
+class BucketQueue:
+    """
+    A*的Open表：f为小整数，按f值分桶，push和pop均摊O(1)，不需要比较状态本身
+    f为无穷大的节点（没有可用通道，启发值无意义）单独放在最后一个桶中，
+    其余桶都为空时才弹出，且总是按g从小到大弹出，退化为一致代价搜索
+    """
+    def __init__(self, tie_break="deep"):
+        if tie_break not in TIE_BREAKS:
+            raise ValueError(f"未知的tie_break: {tie_break}，可选值: {TIE_BREAKS}")
+        self.deep = tie_break == "deep"
+        self.buckets = []            # f -> _Bucket
+        self.inf_bucket = _Bucket()
+        self.min_f = 0               # 不大于任何非空桶的f值
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, f, g, item):
+        self.size += 1
+        if f == float('inf'):
+            self.inf_bucket.push(g, item, False)
+            return
+        while len(self.buckets) <= f:
+            self.buckets.append(_Bucket())
+        if f < self.min_f:
+            self.min_f = f
+        self.buckets[f].push(g, item, self.deep)
+
+    def pop(self):
+        """弹出f最小的节点，返回(f, g, item)"""
+        if not self.size:
+            raise IndexError("pop from empty BucketQueue")
+        self.size -= 1
+        while self.min_f < len(self.buckets):
+            bucket = self.buckets[self.min_f]
+            if bucket.count:
+                g, item = bucket.pop(self.deep)
+                return self.min_f, g, item
+            self.min_f += 1
+        g, item = self.inf_bucket.pop(False)
+        return float('inf'), g, item
+
+# ================= 节点表 =================
+# 移动方向：(dx, dy, 标记)，节点表中的移动编码为 方块编号 * 4 + 方向序号
+MOVES = [(1, 0, "D"), (-1, 0, "U"), (0, 1, "R"), (0, -1, "L")]
+
+class NodeTable:
+    """
+    A*搜索的节点表：每个状态只保存一次并映射为整数编号，
+    g值、父节点、到达该节点的移动和关闭标记按编号存放在紧凑数组中，
+    Open表中只保存节点编号，解路径沿父节点回溯得到
+    状态以Zobrist哈希查找，只在哈希相同时比较状态本身
+    """
+    def __init__(self):
+        self.states = []            # 节点编号 -> 状态
+        self.ids = ZobristMap(self.states.__getitem__)   # 状态哈希 -> 节点编号
+        self.hashes = array('Q')
+        # 行元组池：一次移动只改变少数几行，相同的行在所有状态间共用一个元组
+        self.rows = {}
+        self.g = array('i')
+        self.parent = array('i')    # 初始节点为-1
+        self.move = array('i')      # 初始节点为-1
+        self.closed = bytearray()
+        self.occupied = []          # 节点编号 -> 占用掩码（墙体和方块占据的格子）
+
+    def __len__(self):
+        return len(self.states)
+
+    def __getstate__(self):
+        # 保存检查点时不保存哈希索引，恢复时由states和hashes重建
+        state = self.__dict__.copy()
+        del state['ids']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.ids = ZobristMap(self.states.__getitem__)
+        for node, (h, node_state) in enumerate(zip(self.hashes, self.states)):
+            self.ids.set(h, node_state, node)
+
+    def find(self, h, state):
+        # 查找状态对应的节点编号，不存在时返回None
+        return self.ids.get(h, state)
+
+    def add(self, state, h, g, parent, move, occupied):
+        node = len(self.states)
+        rows = self.rows
+        state = tuple([rows.setdefault(row, row) for row in state])
+        self.states.append(state)
+        self.ids.set(h, state, node)
+        self.hashes.append(h)
+        self.g.append(g)
+        self.parent.append(parent)
+        self.move.append(move)
+        self.closed.append(0)
+        self.occupied.append(occupied)
+        return node
+
+    def get_path(self, node):
+        """回溯父节点，返回从初始状态到该节点的移动列表[(方块编号, 方向标记), ...]"""
+        path = []
+        while self.parent[node] != -1:
+            block_id, direction = divmod(self.move[node], 4)
+            path.append((block_id, MOVES[direction][2]))
+            node = self.parent[node]
+        path.reverse()
+        return path
+
 # ... 其他工具函数保持不变 ...
 # ================= 启发式函数 =================
 # def heuristic(board, start, goal):
@@ -240,9 +539,30 @@ def calculate_cost(path, board):
 #     return float('inf')
 
 # ================= A* 主体 =================
-def solve_puzzle(initial_board, start, goal):
+def solve_puzzle(initial_board, start, goal, tie_break="deep", partial_order=True,
+                 checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, corridor=None,
+                 profile_memory=False):
     """
     A*算法求解推箱子谜题，包含性能分析
+    tie_break: f值相同时的出队顺序，见TIE_BREAKS
+    partial_order: 是否启用偏序约简，跳过可交换移动的重复顺序（见move_order）
+    checkpoint_path: 检查点文件路径，每隔checkpoint_interval秒保存节点表和Open表（见checkpoint）；
+                     文件中已有同一求解任务的检查点时从中恢复，求解结束后删除
+    corridor: 预先算好的起点到终点通路格子（find_corridor_cells，同一几何的关卡可共用）
+    profile_memory: 是否用tracemalloc分析内存，峰值内存和各数据结构的占用记录在性能统计中（见memory_profile）
+    """
+    result = run_to_result(iter_solve_puzzle(initial_board, start, goal, tie_break, partial_order, checkpoint_path,
+                                             checkpoint_interval, corridor, progress_interval=None,
+                                             profile_memory=profile_memory))
+    return result['path'], result['board'], result['duration'], result['expanded'], result['opened']
+
+def iter_solve_puzzle(initial_board, start, goal, tie_break="deep", partial_order=True,
+                      checkpoint_path=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, corridor=None,
+                      progress_interval=DEFAULT_PROGRESS_INTERVAL, profile_memory=False):
+    """
+    以生成器方式执行A*求解（参数同solve_puzzle，见progress）
+    progress_interval: 进度事件间隔（秒），f_bound为当前出队的f值，frontier为Open表大小；None表示只产出结果事件
+    最后产出结果事件 {'type': 'result', 'engine', 'path', 'board', 'duration', 'expanded', 'opened', 'perf_stats'}
     """
     # 记录开始时间
     start_time = time.time()
@@ -257,14 +577,36 @@ def solve_puzzle(initial_board, start, goal):
         'heuristic_calls': 0,       # 启发函数调用次数
         'serialize_calls': 0,       # 序列化调用次数
         'deserialize_calls': 0,     # 反序列化调用次数
-        'empty_path_calls': 0       # empty_path_exists调用次数
+        'empty_path_calls': 0,      # empty_path_exists调用次数
+        'node_count': 0,            # 节点表中的状态数
+        'hash_collisions': 0,       # Zobrist哈希冲突的状态数
+        'immovable_blocks': [],     # 被墙体和边界锁死、不参与搜索的方块
+        'pruned_blocks': [],        # 与起点到终点通路无关、被固定不动的方块
+        'por_skipped_moves': 0,     # 偏序约简跳过的移动数
+        'por_reexpansions': 0       # 已关闭节点以相同g值被再次到达后的补充扩展次数
     }
+    profiler = None
+    if profile_memory:
+        profiler = MemoryProfiler()
+        profiler.start()
+
+    # 静态分析：每个方块只尝试墙体和边界允许的方向，无法移动的方块不生成任何移动，
+    # 与起点到终点通路无关的方块固定不动
+    mobility = analyze_block_mobility(initial_board)
+    relevant = find_relevant_blocks(initial_board, start, goal, corridor)
+    block_moves = {block_id: [(direction, dx, dy) for direction, (dx, dy, _) in enumerate(MOVES)
+                              if (dx, dy) in offsets and block_id in relevant]
+                   for block_id, offsets in mobility.items()}
+    perf_stats['immovable_blocks'] = sorted(block_id for block_id, offsets in mobility.items() if not offsets)
+    perf_stats['pruned_blocks'] = sorted(block_id for block_id in mobility if block_id not in relevant)
 
     all_paths = find_all_paths(initial_board, start, goal)
     valid_paths = remove_suboptimal_paths(all_paths)
+    # 通道预编译为位掩码，目标检测和启发值只做位运算
+    masks = CorridorMasks(initial_board, start, goal, valid_paths)
     
     # 初始化优先队列（Open表），用于存储待访问的状态
-    open_heap = []
+    open_list = BucketQueue(tie_break)
     
     # 序列化初始状态并计时
     serialize_start = time.time()
@@ -272,12 +614,20 @@ def solve_puzzle(initial_board, start, goal):
     perf_stats['serialize_time'] += time.time() - serialize_start
     perf_stats['serialize_calls'] += 1
     
-    # g_scores字典：记录从初始状态到每个状态的实际代价
-    g_scores = {initial_state: 0}
+    # 节点表：每个状态只保存一次，记录g值、父节点、移动和关闭标记
+    # 状态哈希由移动增量更新，代价只与方块大小有关
+    zobrist = ZobristTable(len(initial_board), len(initial_board[0]))
+    nodes = NodeTable()
+    root = nodes.add(initial_state, zobrist.hash_state(initial_state), 0, -1, -1, masks.occupancy(initial_board))
+    # 按棋盘几何缓存的移动表：合法性只需检查进入的格子，足迹掩码直接查表
+    table = get_move_table(initial_board)
+    shape_ids = {block_id: table.get_shape_id(cells) for block_id, cells in find_blocks(initial_board).items()}
+    # 偏序约简：未关闭节点 -> 以当前g值到达该节点的所有移动[(方块编号, 足迹掩码), ...]
+    arrivals = {}
     
     # 计算初始状态的启发值并计时
     heuristic_start = time.time()
-    h = heuristic(initial_board, start, goal, valid_paths)
+    h = masks.blocking_cost(masks.block_masks(find_blocks(initial_board)))
     perf_stats['heuristic_time'] += time.time() - heuristic_start
     perf_stats['heuristic_calls'] += 1
     
@@ -285,86 +635,283 @@ def solve_puzzle(initial_board, start, goal):
     f = 0 + h
     
     # 将初始状态加入优先队列
-    heapq.heappush(open_heap, (f, 0, initial_state, []))
+    open_list.push(f, 0, root)
 
     # 统计变量：expanded为已扩展的节点数，opened为已打开的状态数
     expanded, opened = 0, 1
-    
-    # visited集合：记录已经访问过的状态，避免重复访问
-    visited = set()
+    reporter = ProgressReporter("astar", progress_interval)
+
+    Checkpointer.init_stats(perf_stats)
+    checkpointer = None
+    if checkpoint_path:
+        checkpointer = Checkpointer(checkpoint_path, ("astar", initial_state, tuple(start), tuple(goal), tie_break, partial_order),
+                                    checkpoint_interval)
+        saved = checkpointer.load()
+        if saved is not None:
+            # 从检查点恢复节点表、Open表和统计信息，计时包含恢复前已用的时间
+            nodes, open_list, arrivals = saved['nodes'], saved['open_list'], saved['arrivals']
+            perf_stats = saved['perf_stats']
+            perf_stats['resumed'] = True
+            expanded, opened = saved['expanded'], saved['opened']
+            start_time = time.time() - saved['elapsed']
 
     # 主循环：处理优先队列中的状态
-    while open_heap:
-        # 从优先队列中取出f值最小的状态
-        f, g, state, path = heapq.heappop(open_heap)
+    while open_list:
+        if reporter.due():
+            yield reporter.event(expanded, f_bound=f, frontier=len(open_list), visited=len(nodes))
+        if checkpointer is not None and checkpointer.due():
+            # 在两次扩展之间保存，此时节点表、Open表和到达移动一致
+            checkpointer.save({
+                'nodes': nodes, 'open_list': open_list, 'arrivals': arrivals, 'perf_stats': perf_stats,
+                'expanded': expanded, 'opened': opened, 'elapsed': time.time() - start_time
+            }, perf_stats)
+        # 从优先队列中取出f值最小的节点
+        f, _, node = open_list.pop()
         
-        # 哈希操作计数
-        perf_stats['hash_operations'] += 1
-        if state in visited:
+        # 同一节点可能因g值更新被多次加入Open表，已关闭的直接跳过
+        if nodes.closed[node]:
             continue
-        
-        # 将状态标记为已访问
-        visited.add(state)
-        
-        # 反序列化状态并计时
-        deserialize_start = time.time()
-        board = deserialize_board(state)
-        perf_stats['deserialize_time'] += time.time() - deserialize_start
-        perf_stats['deserialize_calls'] += 1
+        nodes.closed[node] = 1
+        g = nodes.g[node]
+        # 状态本身（元组）即可读取方块位置，不再反序列化
+        board = nodes.states[node]
         
         # 增加已扩展节点计数
         expanded += 1
 
         # 检查当前状态是否为目标状态：起点到终点是否存在空路径
-        # 计时empty_path_exists函数调用
+        # 计时目标检测（与empty_path_exists等价的位运算）
         empty_path_start = time.time()
-        is_goal = empty_path_exists(board, start, goal)
+        is_goal = masks.is_goal(nodes.occupied[node])
         perf_stats['empty_path_time'] += time.time() - empty_path_start
         perf_stats['empty_path_calls'] += 1
         
         if is_goal:
             duration = time.time() - start_time
+            perf_stats['node_count'] = len(nodes)
+            perf_stats['hash_collisions'] = len(nodes.ids.collisions)
+            if profiler is not None:
+                profiler.finish(perf_stats, node_memory_structures(nodes, open_list, arrivals), len(nodes))
             # 打印性能统计信息
             print_performance_stats(perf_stats, duration)
-            return path, board, duration, expanded, opened
+            if checkpointer is not None:
+                checkpointer.clear()
+            deserialize_start = time.time()
+            board = deserialize_board(board)
+            perf_stats['deserialize_time'] += time.time() - deserialize_start
+            perf_stats['deserialize_calls'] += 1
+            yield {'type': 'result', 'engine': 'astar', 'path': nodes.get_path(node), 'board': board,
+                   'duration': duration, 'expanded': expanded, 'opened': opened, 'perf_stats': perf_stats}
+            return
 
-        # 找到当前棋盘上的所有方块
-        blocks = find_blocks(board)
-        
-        # 尝试移动每个方块的四个方向
-        for block_id, cells in blocks.items():
-            for dx, dy, move_label in [(1,0,"D"),(-1,0,"U"),(0,1,"R"),(0,-1,"L")]:
-                if can_move(cells, dx, dy, board):
-                    # 执行移动，生成新的棋盘状态
-                    new_board = move_block(block_id, dx, dy, board)
-                    
-                    # 序列化新状态并计时
+        # 待扩展列表：(节点, 棋盘, 到达移动)。刚关闭的节点按其全部到达移动做偏序约简；
+        # 已关闭节点以相同g值被再次到达时，补充扩展对新到达移动不可跳过的那些移动
+        expansions = [(node, board, arrivals.pop(node, ()))]
+        while expansions:
+            node, board, node_arrivals = expansions.pop()
+            g = nodes.g[node]
+            occupied = nodes.occupied[node]
+
+            # 找到当前棋盘上的所有方块及其位掩码
+            blocks = find_blocks(board)
+            block_masks = masks.block_masks(blocks)
+            
+            # 尝试移动每个方块的四个方向
+            for block_id, cells in blocks.items():
+                shape_id = shape_ids[block_id]
+                for direction, dx, dy in block_moves.get(block_id, ()):
+                    move = table.get_move(shape_id, cells[0], dx, dy)
+                    if move is None:
+                        # 移出棋盘或撞墙
+                        continue
+                    footprint = move.footprint_mask
+                    if partial_order and is_redundant(block_id, footprint, node_arrivals):
+                        perf_stats['por_skipped_moves'] += 1
+                        continue
+                    if move.entering_mask & occupied:
+                        continue
+                    # 执行移动，直接生成新的状态（只重建改动的行）并计时
                     serialize_start = time.time()
-                    new_state = serialize_board(new_board)
+                    new_state = apply_table_move(board, block_id, move)
                     perf_stats['serialize_time'] += time.time() - serialize_start
                     perf_stats['serialize_calls'] += 1
                     
                     # 哈希操作计数
                     perf_stats['hash_operations'] += 1
                     new_g = g + 1
-                    if new_state not in g_scores or new_g < g_scores[new_state]:
-                        g_scores[new_state] = new_g
-                        
-                        # 计算新状态的启发值并计时
-                        heuristic_start = time.time()
-                        new_h = heuristic(new_board, start, goal, valid_paths)
-                        perf_stats['heuristic_time'] += time.time() - heuristic_start
-                        perf_stats['heuristic_calls'] += 1
-                        
-                        new_f = new_g + new_h
-                        new_path = path + [(block_id, move_label)]
-                        heapq.heappush(open_heap, (new_f, new_g, new_state, new_path))
-                        opened += 1
+                    new_hash = nodes.hashes[node] ^ zobrist.move_delta(block_id, cells, dx, dy)
+                    new_node = nodes.find(new_hash, new_state)
+                    arrival = (block_id, footprint)
+                    if new_node is None:
+                        new_node = nodes.add(new_state, new_hash, new_g, node, block_id * 4 + direction,
+                                             occupied ^ move.changed_mask)
+                    elif not nodes.closed[new_node] and new_g < nodes.g[new_node]:
+                        # 找到更短的到达路径，原地更新节点
+                        nodes.g[new_node] = new_g
+                        nodes.parent[new_node] = node
+                        nodes.move[new_node] = block_id * 4 + direction
+                    elif partial_order and new_g == nodes.g[new_node]:
+                        # 以相同g值再次到达：未关闭的节点合并到达移动，已关闭的节点补充扩展
+                        if not nodes.closed[new_node]:
+                            arrivals.setdefault(new_node, []).append(arrival)
+                        else:
+                            perf_stats['por_reexpansions'] += 1
+                            expansions.append((new_node, nodes.states[new_node], (arrival,)))
+                        continue
+                    else:
+                        continue
+                    if partial_order:
+                        arrivals[new_node] = [arrival]
+                    # 计算新状态的启发值并计时
+                    heuristic_start = time.time()
+                    new_h = masks.blocking_cost(block_masks, block_id, move.changed_mask)
+                    perf_stats['heuristic_time'] += time.time() - heuristic_start
+                    perf_stats['heuristic_calls'] += 1
+                    
+                    new_f = new_g + new_h
+                    open_list.push(new_f, new_g, new_node)
+                    opened += 1
 
     # 如果无法找到解，返回None和统计信息
     duration = time.time() - start_time
+    perf_stats['node_count'] = len(nodes)
+    perf_stats['hash_collisions'] = len(nodes.ids.collisions)
+    if profiler is not None:
+        profiler.finish(perf_stats, node_memory_structures(nodes, open_list, arrivals), len(nodes))
     print_performance_stats(perf_stats, duration)
-    return None, None, duration, expanded, opened
+    if checkpointer is not None:
+        checkpointer.clear()
+    yield {'type': 'result', 'engine': 'astar', 'path': None, 'board': None,
+           'duration': duration, 'expanded': expanded, 'opened': opened, 'perf_stats': perf_stats}
+
+def node_memory_structures(nodes, open_list, arrivals):
+    # 内存分析时按数据结构归类：状态及其索引、父节点和移动（解路径）、g值、Open表、偏序约简的到达移动
+    return {
+        'visited': [nodes.states, nodes.rows, nodes.ids, nodes.hashes, nodes.occupied, nodes.closed],
+        'paths': [nodes.parent, nodes.move],
+        'g_scores': [nodes.g],
+        'queue': [open_list],
+        'arrivals': [arrivals],
+    }
+
+# ================= 束搜索 =================
+# 大棋盘（10x10及以上）上BFS和A*都会耗尽内存，束搜索每层只保留启发值最好的K个状态，
+# 重复检测只覆盖最近若干层，峰值内存为O(K·深度)，得到的解不保证最优
+DEFAULT_BEAM_WIDTH = 5000      # 每层保留的状态数K
+DEFAULT_BEAM_WINDOW = 4        # 重复检测覆盖的最近层数
+DEFAULT_BEAM_MAX_DEPTH = 500   # 最大搜索深度
+
+def beam_search(initial_board, start, goal, beam_width=DEFAULT_BEAM_WIDTH,
+                window=DEFAULT_BEAM_WINDOW, max_depth=DEFAULT_BEAM_MAX_DEPTH):
+    """
+    束搜索求解，返回值与solve_puzzle相同
+    状态按启发值排序，启发值取起点到终点所有路径上最少的被占格子数（CorridorMasks.blocked_cells）；
+    与heuristic不同，它按格子而不是按方块计数，大方块挡路的代价更高（按不同方块数排序的束搜索在随机棋盘上找到的解更少）；
+    启发值相同的状态按哈希排序，相当于随机打散，避免束中挤满相邻的相似状态
+    beam_width: 每层保留的状态数
+    window: 与最近多少层的状态比较去重（按Zobrist哈希，冲突时只会多丢弃一个状态）
+    max_depth: 最大搜索深度，超过后视为未找到解
+    """
+    if beam_width < 1 or window < 1:
+        raise ValueError("beam_width和window必须为正整数")
+    start_time = time.time()
+    beam_stats = {
+        'beam_width': beam_width,   # 使用的束宽
+        'window': window,           # 使用的去重窗口
+        'max_depth': max_depth,     # 使用的深度上限
+        'depth': 0,                 # 搜索到的深度
+        'solution_length': None,    # 解的步数，未找到时为None
+        'duplicates': 0,            # 窗口内重复而丢弃的状态数
+        'dropped': 0,               # 超出束宽而丢弃的状态数
+        'peak_layer': 1,            # 单层保留的最多状态数
+        'pruned_blocks': []         # 与通路无关、被固定不动的方块
+    }
+
+    mobility = analyze_block_mobility(initial_board)
+    relevant = find_relevant_blocks(initial_board, start, goal)
+    block_moves = {block_id: [(direction, dx, dy) for direction, (dx, dy, _) in enumerate(MOVES)
+                              if (dx, dy) in offsets and block_id in relevant]
+                   for block_id, offsets in mobility.items()}
+    beam_stats['pruned_blocks'] = sorted(block_id for block_id in mobility if block_id not in relevant)
+
+    masks = CorridorMasks(initial_board, start, goal, [])
+    table = get_move_table(initial_board)
+    shape_ids = {block_id: table.get_shape_id(cells) for block_id, cells in find_blocks(initial_board).items()}
+    zobrist = ZobristTable(len(initial_board), len(initial_board[0]))
+
+    initial_state = serialize_board(initial_board)
+    initial_hash = zobrist.hash_state(initial_state)
+    occupied = masks.occupancy(initial_board)
+    expanded, opened = 0, 1
+
+    def finish(path, state):
+        duration = time.time() - start_time
+        if path is not None:
+            beam_stats['solution_length'] = len(path)
+        print_beam_stats(beam_stats, duration)
+        return path, None if state is None else deserialize_board(state), duration, expanded, opened
+
+    if masks.is_goal(occupied):
+        return finish([], initial_state)
+
+    # 当前层：[(状态, 哈希, 占用掩码), ...]；历史层只保存父状态在上一层中的序号和移动编码
+    layer = [(initial_state, initial_hash, occupied)]
+    history = []
+    recent = deque([{initial_hash}], maxlen=window)
+    for depth in range(1, max_depth + 1):
+        beam_stats['depth'] = depth
+        candidates = []
+        generated = set()
+        for index, (state, h, occupied) in enumerate(layer):
+            expanded += 1
+            for block_id, cells in find_blocks(state).items():
+                shape_id = shape_ids[block_id]
+                for direction, dx, dy in block_moves.get(block_id, ()):
+                    move = table.get_move(shape_id, cells[0], dx, dy)
+                    if move is None or move.entering_mask & occupied:
+                        continue
+                    new_hash = h ^ zobrist.move_delta(block_id, cells, dx, dy)
+                    if new_hash in generated or any(new_hash in hashes for hashes in recent):
+                        beam_stats['duplicates'] += 1
+                        continue
+                    generated.add(new_hash)
+                    opened += 1
+                    new_state = apply_table_move(state, block_id, move)
+                    new_occupied = occupied ^ move.changed_mask
+                    if masks.is_goal(new_occupied):
+                        # 回溯各层的父序号得到解路径
+                        path = [(block_id, MOVES[direction][2])]
+                        parent = index
+                        for parents, moves in reversed(history):
+                            block, parent_direction = divmod(moves[parent], 4)
+                            path.append((block, MOVES[parent_direction][2]))
+                            parent = parents[parent]
+                        path.reverse()
+                        return finish(path, new_state)
+                    score = (masks.blocked_cells(new_occupied), new_hash)
+                    candidates.append((score, new_state, new_hash, new_occupied, index, block_id * 4 + direction))
+        if not candidates:
+            break
+        if len(candidates) > beam_width:
+            beam_stats['dropped'] += len(candidates) - beam_width
+            candidates = heapq.nsmallest(beam_width, candidates, key=itemgetter(0))
+        beam_stats['peak_layer'] = max(beam_stats['peak_layer'], len(candidates))
+        history.append((array('i', [c[4] for c in candidates]), array('i', [c[5] for c in candidates])))
+        layer = [(new_state, new_hash, new_occupied) for _, new_state, new_hash, new_occupied, _, _ in candidates]
+        recent.append({new_hash for _, new_hash, _ in layer})
+    return finish(None, None)
+
+def print_beam_stats(beam_stats, total_time):
+    """打印束搜索结果和使用的界限"""
+    print("\n=== 束搜索结果 ===")
+    print(f"总耗时: {total_time:.4f} 秒")
+    print(f"束宽: {beam_stats['beam_width']}, 去重窗口: {beam_stats['window']} 层, 深度上限: {beam_stats['max_depth']}")
+    if beam_stats['solution_length'] is None:
+        print(f"在深度 {beam_stats['depth']} 内未找到解")
+    else:
+        print(f"解的步数: {beam_stats['solution_length']}（不保证最优）")
+    print(f"单层最多状态数: {beam_stats['peak_layer']}, 超出束宽丢弃: {beam_stats['dropped']}, 窗口内重复: {beam_stats['duplicates']}")
+    print(f"被固定的无关方块: {beam_stats['pruned_blocks']}")
 
 # ================= 性能统计函数 =================
 def print_performance_stats(perf_stats, total_time):
@@ -376,6 +923,15 @@ def print_performance_stats(perf_stats, total_time):
     print(f"棋盘反序列化: {perf_stats['deserialize_time']:.4f} 秒 ({perf_stats['deserialize_time']/total_time*100:.2f}%), 调用次数: {perf_stats['deserialize_calls']}")
     print(f"路径存在检查(empty_path_exists): {perf_stats['empty_path_time']:.4f} 秒 ({perf_stats['empty_path_time']/total_time*100:.2f}%), 调用次数: {perf_stats['empty_path_calls']}")
     print(f"哈希操作次数: {perf_stats['hash_operations']}")
+    print(f"节点表状态数: {perf_stats['node_count']}, 哈希冲突: {perf_stats['hash_collisions']}")
+    print(f"无法移动的方块: {perf_stats['immovable_blocks']}, 被固定的无关方块: {perf_stats['pruned_blocks']}")
+    print(f"偏序约简跳过的移动: {perf_stats['por_skipped_moves']}, 补充扩展次数: {perf_stats['por_reexpansions']}")
+    if perf_stats.get('checkpoint_count') or perf_stats.get('resumed'):
+        print(f"检查点: {perf_stats['checkpoint_count']} 次, {perf_stats['checkpoint_time']:.4f} 秒 "
+              f"({perf_stats['checkpoint_time']/total_time*100:.2f}%), 最近大小: {perf_stats['checkpoint_bytes']} 字节, "
+              f"从检查点恢复: {'是' if perf_stats['resumed'] else '否'}")
+    if 'memory_peak' in perf_stats:
+        print(format_memory_stats(perf_stats))
     
     # 计算各部分时间占比并找出主要瓶颈
     bottlenecks = []
@@ -437,10 +993,40 @@ if __name__ == "__main__":
     ]
     start = (4,0)
     goal = (2,5)
-    
-    # 使用基本性能分析
-    print("运行基本性能分析...")
-    path, final_board, duration, expanded, opened = solve_puzzle(board, start, goal)
+
+    # 命令行用法：python correct_solver.py [--level levels/xxx.json] [--beam 1000 --window 4]
+    parser = argparse.ArgumentParser(description="A*/束搜索求解华容道，默认求解内置示例")
+    parser.add_argument("--level", help="关卡JSON文件，墙体99按-1处理")
+    parser.add_argument("--tie-break", choices=TIE_BREAKS, default="deep", help="A*中f值相同时的出队顺序")
+    parser.add_argument("--no-partial-order", action="store_true", help="A*关闭偏序约简")
+    parser.add_argument("--beam", type=int, default=None, help="使用束搜索，指定每层保留的状态数")
+    parser.add_argument("--window", type=int, default=DEFAULT_BEAM_WINDOW, help="束搜索去重覆盖的最近层数")
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_BEAM_MAX_DEPTH, help="束搜索最大深度")
+    parser.add_argument("--checkpoint", default=None, help="A*检查点文件，已存在时从中恢复")
+    parser.add_argument("--checkpoint-interval", type=float, default=DEFAULT_CHECKPOINT_INTERVAL, help="检查点保存间隔（秒）")
+    parser.add_argument("--profile-memory", action="store_true", help="A*用tracemalloc分析内存占用")
+    parser.add_argument("--progress", type=float, default=None, metavar="SECONDS", help="A*每隔若干秒打印一次搜索进度")
+    args = parser.parse_args()
+    if args.level:
+        with open(args.level, "r") as f:
+            level = json.load(f)
+        board = [[-1 if value == 99 else value for value in row] for row in level["board"]]
+        start, goal = (tuple(target) for target in level["targets"])
+
+    if args.beam is not None:
+        print(f"运行束搜索（束宽 {args.beam}）...")
+        path, final_board, duration, expanded, opened = beam_search(board, start, goal, args.beam,
+                                                                    args.window, args.max_depth)
+    else:
+        # 使用基本性能分析
+        print("运行基本性能分析...")
+        for event in iter_solve_puzzle(board, start, goal, args.tie_break, not args.no_partial_order,
+                                       args.checkpoint, args.checkpoint_interval, progress_interval=args.progress,
+                                       profile_memory=args.profile_memory):
+            if event['type'] == 'progress':
+                print(format_progress(event))
+        path, final_board, duration = event['path'], event['board'], event['duration']
+        expanded, opened = event['expanded'], event['opened']
     
     # 可选：使用详细性能分析（使用cProfile）
     # print("\n\n运行详细性能分析...")
@@ -1,24 +1,42 @@
 import pygame
 import time
+import bisect
 from typing import List, Tuple, Dict, Set
 from constants import *
-from utils import get_block_shape, are_shapes_equal, get_block_positions, calculate_block_bounds, is_position_in_board
+from utils import get_positions_shape, are_shapes_equal, calculate_block_bounds, is_position_in_board, format_time
+from board import Board
+from text_cache import text_cache
 
 class Game:
     def __init__(self, board_size: Tuple[int, int], board=None, targets=None, mode="solve"):
         self.board_size = board_size
         self.rows, self.cols = board_size
+        # 脏矩形记录：自上次绘制以来需要重绘的屏幕区域
+        self.dirty_rects = []
+        # 整屏重绘标记，新建棋盘后第一帧需要完整绘制
+        self.full_redraw = True
+        self._selected_cell = None
+        # 上一次绘制的计时文本，文本变化时才重绘状态栏
+        self.drawn_timer_text = None
         self.board = self._initialize_board(board)
+        # 方块位置索引：方块编号 -> 按行优先排序的格子列表，以及外接边界(min_i, max_i, min_j, max_j)
+        # 由移动和出题编辑增量维护，各处读取方块位置时不再扫描整个棋盘
+        self.block_cells = {}
+        self.block_bounds = {}
+        self._rebuild_block_index()
         # 初始化目标点
         self._initialize_targets(targets)
         # 形状到颜色的映射字典，根据形状特征生成颜色
         self.shape_color_map = {}
+        # 方块编号到形状、颜色的缓存，解题模式下移动不改变形状，只在出题编辑时失效
+        self.block_shape_cache = {}
+        self.block_color_cache = {}
         self.cell_size = CELL_SIZE
         self.margin = MARGIN
         # 颜色方案
         self.colors = COLORS
-        # 字体设置
-        self.font = get_font()
+        # 字体设置（字体只解析一次，由全局文本缓存共享）
+        self.font = text_cache.get_font()
         self.selected_block = None
         self.win = False
         self.mode = mode  # 'create' for level creation, 'solve' for solving
@@ -44,10 +62,43 @@ class Game:
         else:
             return board
             
+    def _rebuild_block_index(self):
+        # 扫描一次棋盘建立方块位置索引（包括墙体99，使用方按需排除）
+        self.block_cells = {}
+        for i in range(self.rows):
+            for j in range(self.cols):
+                if self.board[i][j] != 0:
+                    self.block_cells.setdefault(self.board[i][j], []).append((i, j))
+        self.block_bounds = {block: calculate_block_bounds(cells) for block, cells in self.block_cells.items()}
+
+    def _set_cell(self, i, j, value):
+        # 修改单个格子的值并增量更新方块位置索引（出题模式编辑使用）
+        old_value = self.board[i][j]
+        if old_value == value:
+            return
+        self.board[i][j] = value
+        if old_value != 0:
+            cells = self.block_cells[old_value]
+            cells.remove((i, j))
+            if cells:
+                self.block_bounds[old_value] = calculate_block_bounds(cells)
+            else:
+                del self.block_cells[old_value]
+                del self.block_bounds[old_value]
+        if value != 0:
+            cells = self.block_cells.setdefault(value, [])
+            bisect.insort(cells, (i, j))
+            self.block_bounds[value] = calculate_block_bounds(cells)
+
+    def get_block_positions(self, block_number):
+        # 获取方块的所有位置（读取索引）
+        return self.block_cells.get(block_number, [])
+
     def _initialize_targets(self, targets):
         # 初始化目标点
         # 初始默认左上角为起点，右下角为终点
-        self.targets = targets or [(0, 0), (self.rows-1, self.cols-1)]
+        # 从JSON读取的目标点是列表，统一转换为元组以便比较和哈希
+        self.targets = [tuple(point) for point in targets] if targets else [(0, 0), (self.rows-1, self.cols-1)]
         # 明确区分起点和终点
         self.start_point = self.targets[0]
         self.end_point = self.targets[1] if len(self.targets) > 1 else None
@@ -60,27 +111,97 @@ class Game:
         self.auto_solve_end_time = None    # 自动求解结束时间
 
     def draw(self, screen):
-        # 显示用户求解计时器（仅在解题模式下显示）
-        if self.mode == "solve" and self.user_solve_start_time:
-            time_text = self.font.render(f"用时: {self.get_user_solve_time_formatted()}", True, (0, 0, 0))
-            screen.blit(time_text, (self.margin, 10))
-        
         # 绘制棋盘
         self._draw_board(screen)
         
         # 绘制选中的格子
         if self.selected_cell:
             self._draw_selected_cell(screen)
-            
-        # 显示胜利信息
-        if self.win:
-            text = self.font.render(TEXT_MESSAGES["WIN"], True, RED)
-            screen.blit(text, (screen.get_width()//2 - text.get_width()//2, self.margin//2))
+
+        # 绘制棋盘上方的状态栏（在棋盘之后，胜利信息覆盖在棋盘上沿）
+        self.draw_status_bar(screen)
         # 显示棋盘锁定状态
         if self.board_locked and self.mode == "solve":
-            text = self.font.render(TEXT_MESSAGES["BOARD_LOCKED"], True, RED)
+            text = text_cache.render(TEXT_MESSAGES["BOARD_LOCKED"], RED)
             screen.blit(text, (screen.get_width()//2 - text.get_width()//2, self.margin//2 + 40))
 
+    def draw_status_bar(self, screen):
+        """
+        绘制状态栏中的内容：计时、起终点字母和胜利信息
+        只有计时变化时由界面层单独调用（先清空状态栏背景），不重绘棋盘
+        """
+        # 显示用户求解计时器（仅在解题模式下显示）
+        self.drawn_timer_text = self.get_timer_text()
+        if self.drawn_timer_text:
+            # 计时文本一直在变化，不放入缓存
+            time_text = self.font.render(self.drawn_timer_text, True, (0, 0, 0))
+            screen.blit(time_text, (self.margin, 10))
+
+        # 绘制起点和终点的字母标记
+        self._draw_start_end_labels(screen)
+
+        # 显示胜利信息
+        if self.win:
+            text = text_cache.render(TEXT_MESSAGES["WIN"], RED)
+            screen.blit(text, (screen.get_width()//2 - text.get_width()//2, self.margin//2))
+
+    def get_timer_text(self):
+        # 状态栏的计时文本，不显示计时时为None；计时中只显示到整秒，每秒重绘一次状态栏，结束后显示毫秒
+        if self.mode != "solve" or not self.user_solve_start_time:
+            return None
+        running = not self.user_solve_end_time
+        return f"用时: {format_time(self.get_user_solve_time(), milliseconds=not running)}"
+
+    # 脏矩形管理
+    @property
+    def selected_cell(self):
+        # 当前选中的格子位置
+        return self._selected_cell
+
+    @selected_cell.setter
+    def selected_cell(self, cell):
+        # 选中格子变化时，新旧两个格子都需要重绘
+        if cell != self._selected_cell:
+            if self._selected_cell:
+                self.mark_cells_dirty([self._selected_cell])
+            if cell:
+                self.mark_cells_dirty([cell])
+        self._selected_cell = cell
+
+    def get_cells_rect(self, cells):
+        # 计算一组格子在屏幕上的外接矩形
+        min_i, max_i, min_j, max_j = calculate_block_bounds(list(cells))
+        return pygame.Rect(self.margin + min_j * self.cell_size,
+                           self.margin + min_i * self.cell_size,
+                           (max_j - min_j + 1) * self.cell_size,
+                           (max_i - min_i + 1) * self.cell_size)
+
+    def get_status_rect(self):
+        # 棋盘上方状态栏（计时、起终点字母）所在区域
+        return pygame.Rect(0, 0, SCREEN_WIDTH, self.margin)
+
+    def mark_cells_dirty(self, cells):
+        # 标记一组格子需要重绘（按外接矩形，方块边框也在其中）
+        if cells:
+            self.dirty_rects.append(self.get_cells_rect(cells))
+
+    def mark_all_dirty(self):
+        # 标记整屏需要重绘
+        self.full_redraw = True
+
+    def pop_dirty_rects(self):
+        """
+        取出自上次绘制以来需要重绘的区域，并清空记录
+        :return: None表示需要整屏重绘，否则为需要重绘的矩形列表
+        """
+        # 计时文本变化时（计时中每秒一次）重绘状态栏
+        if self.get_timer_text() != self.drawn_timer_text:
+            self.dirty_rects.append(self.get_status_rect())
+        rects = None if self.full_redraw else self.dirty_rects
+        self.full_redraw = False
+        self.dirty_rects = []
+        return rects
+
     def _draw_board(self, screen):
         # 绘制棋盘格子
         self._draw_board_cells(screen)
@@ -91,9 +212,6 @@ class Game:
         # 绘制数字
         self._draw_numbers(screen)
         
-        # 绘制起点和终点的字母标记
-        self._draw_start_end_labels(screen)
-        
         # 框选相同数字的格子
         if self.mode != "create":  # 只在解题模式下显示
             self._draw_block_borders(screen)
@@ -145,7 +263,7 @@ class Game:
                 x = self.margin + j * self.cell_size
                 y = self.margin + i * self.cell_size
                 if self.board[i][j] != 0 and self.board[i][j] != 99:
-                    text = self.font.render(str(self.board[i][j]), True, (0, 0, 0))
+                    text = text_cache.render(str(self.board[i][j]), (0, 0, 0), scope="level")
                     screen.blit(text, (x + self.cell_size//2 - text.get_width()//2, 
                                       y + self.cell_size//2 - text.get_height()//2))
                     
@@ -156,10 +274,10 @@ class Game:
                 x = self.margin + j * self.cell_size
                 y = self.margin + i * self.cell_size
                 if (i, j) == self.start_point:
-                    text = self.font.render("S", True, (0, 0, 0))
+                    text = text_cache.render("S", (0, 0, 0))
                     screen.blit(text, (x + self.cell_size - text.get_width() - 5, 5))
                 elif (i, j) == self.end_point:
-                    text = self.font.render("E", True, (0, 0, 0))
+                    text = text_cache.render("E", (0, 0, 0))
                     screen.blit(text, (x + self.cell_size - text.get_width() - 5, 5))
                     
     def _draw_targets(self, screen):
@@ -173,24 +291,11 @@ class Game:
         # 出题模式下且未完成时，不绘制边框
         if self.mode == "create" and not self.level_complete:
             return
-        # 找出所有非零且非墙体数字及其位置
-        block_positions = {}
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.board[i][j] != 0 and self.board[i][j] != 99:
-                    num = self.board[i][j]
-                    if num not in block_positions:
-                        block_positions[num] = []
-                    block_positions[num].append((i, j))
-        
-        # 为每个数字绘制边框
-        for num, positions in block_positions.items():
-            if len(positions) > 1:  # 只框选包含多个格子的方块
-                # 计算边框的边界
-                min_i = min(pos[0] for pos in positions)
-                max_i = max(pos[0] for pos in positions)
-                min_j = min(pos[1] for pos in positions)
-                max_j = max(pos[1] for pos in positions)
+        # 为每个非墙体方块绘制边框（位置和边界直接读取索引）
+        for num, positions in self.block_cells.items():
+            if num != 99 and len(positions) > 1:  # 只框选包含多个格子的方块
+                # 边框的边界
+                min_i, max_i, min_j, max_j = self.block_bounds[num]
                 
                 # 计算边框的位置和大小
                 x = self.margin + min_j * self.cell_size
@@ -227,8 +332,20 @@ class Game:
 
     # 方块形状和颜色相关方法
     def get_block_shape(self, block_number):
-        # 获取方块的形状特征（考虑旋转等价性）
-        return get_block_shape(self.board, block_number, self.rows, self.cols)
+        # 获取方块的形状特征（考虑旋转等价性），结果按方块编号缓存
+        if block_number not in self.block_shape_cache:
+            self.block_shape_cache[block_number] = get_positions_shape(self.get_block_positions(block_number))
+        return self.block_shape_cache[block_number]
+
+    def invalidate_block_shapes(self):
+        # 棋盘被编辑后清空形状和颜色缓存（形状到颜色的映射保留，颜色保持稳定）
+        self.block_shape_cache.clear()
+        self.block_color_cache.clear()
+
+    def _on_board_edited(self):
+        # 出题模式下格子被修改：方块形状可能变化，清空缓存并整屏重绘
+        self.invalidate_block_shapes()
+        self.mark_all_dirty()
         
     def are_shapes_equal(self, shape1, shape2):
         # 判断两个形状是否相同（考虑旋转等价性）
@@ -238,6 +355,14 @@ class Game:
         # 出题模式下且未完成时，返回默认颜色
         if self.mode == "create" and not self.level_complete:
             return DEFAULT_COLOR
+        # 已缓存的方块直接返回颜色
+        color = self.block_color_cache.get(block_number)
+        if color is None:
+            color = self._compute_block_color(block_number)
+            self.block_color_cache[block_number] = color
+        return color
+
+    def _compute_block_color(self, block_number):
         # 根据形状获取方块颜色
         shape = self.get_block_shape(block_number)
         
@@ -298,10 +423,11 @@ class Game:
             # 0键清除方块值
             if self.selected_cell:
                 i, j = self.selected_cell
-                self.board[i][j] = 0
+                self._set_cell(i, j, 0)
                 # 清除对应的cell_colors
                 if (i, j) in self.cell_colors:
                     del self.cell_colors[(i, j)]
+                self._on_board_edited()
             # 0键也触发数字输入确认
             self._confirm_number_input()
         elif event.key == pygame.K_b:
@@ -310,15 +436,18 @@ class Game:
                 i, j = self.selected_cell
                 # 确保墙体不会设置在起点或终点上
                 if (i, j) != self.start_point and (i, j) != self.end_point:
-                    self.board[i][j] = 99
+                    self._set_cell(i, j, 99)
                     # 立即更新墙体颜色
-                    self.cell_colors[i][j] = (0, 0, 0)
+                    self.cell_colors[(i, j)] = (0, 0, 0)
+                    self._on_board_edited()
             # B键也触发数字输入确认
             self._confirm_number_input()
         elif event.key == pygame.K_RETURN:
             # Enter键完成出题
             if not self.number_input_buffer:
                 self.level_complete = True
+                # 出题完成后方块改为按形状着色，整屏重绘
+                self.mark_all_dirty()
         # 方向键仍然可以移动选中的格子
         elif event.key == pygame.K_UP:
             if self.selected_cell:
@@ -363,10 +492,11 @@ class Game:
                 if 1 <= num <= 81:
                     i, j = self.selected_cell
                     # 允许在起点和终点位置设置方块值
-                    self.board[i][j] = num
+                    self._set_cell(i, j, num)
                     # 清除对应的cell_colors
                     if (i, j) in self.cell_colors:
                         del self.cell_colors[(i, j)]
+                    self._on_board_edited()
             except ValueError:
                 # 如果转换失败，清空缓冲区
                 print("无效的数字输入")
@@ -388,10 +518,11 @@ class Game:
                     # 如果是单个数字，立即显示到棋盘上
                     if len(self.number_input_buffer) == 1:
                         i, j = self.selected_cell
-                        self.board[i][j] = int(self.number_input_buffer)
+                        self._set_cell(i, j, int(self.number_input_buffer))
                         # 清除对应的cell_colors
                         if (i, j) in self.cell_colors:
                             del self.cell_colors[(i, j)]
+                        self._on_board_edited()
             return True
         elif pygame.K_KP1 <= event.key <= pygame.K_KP9:
             # 小键盘数字输入
@@ -405,10 +536,11 @@ class Game:
                     # 如果是单个数字，立即显示到棋盘上
                     if len(self.number_input_buffer) == 1:
                         i, j = self.selected_cell
-                        self.board[i][j] = int(self.number_input_buffer)
+                        self._set_cell(i, j, int(self.number_input_buffer))
                         # 清除对应的cell_colors
                         if (i, j) in self.cell_colors:
                             del self.cell_colors[(i, j)]
+                        self._on_board_edited()
             return True
         elif event.key == pygame.K_KP0:
             # 小键盘0输入
@@ -421,10 +553,11 @@ class Game:
                     # 如果是单个数字，立即显示到棋盘上
                     if len(self.number_input_buffer) == 1:
                         i, j = self.selected_cell
-                        self.board[i][j] = int(self.number_input_buffer)
+                        self._set_cell(i, j, int(self.number_input_buffer))
                         # 清除对应的cell_colors
                         if (i, j) in self.cell_colors:
                             del self.cell_colors[(i, j)]
+                        self._on_board_edited()
             return True
         return False
                     
@@ -453,12 +586,10 @@ class Game:
         elif pygame.K_KP1 <= event.key <= pygame.K_KP9:
             # 小键盘数字键选择方块
             self.selected_block = (event.key - pygame.K_KP0) + 9
-            # 查找并选中该数字的第一个出现位置
-            for i in range(self.rows):
-                for j in range(self.cols):
-                    if self.board[i][j] == self.selected_block:
-                        self.selected_cell = (i, j)
-                        return
+            # 选中该数字的第一个出现位置（索引按行优先排序）
+            positions = self.get_block_positions(self.selected_block)
+            if positions:
+                self.selected_cell = positions[0]
         elif event.key == pygame.K_0:
             # 0键取消选择
             self.selected_block = None
@@ -499,28 +630,20 @@ class Game:
         if self.selected_block is None or self.selected_block == 0:
             return False
 
-        # 找到方块的所有位置
-        block_positions = []
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if self.board[i][j] == self.selected_block:
-                    block_positions.append((i, j))
+        # 从索引读取方块的所有位置
+        block_positions = list(self.get_block_positions(self.selected_block))
 
         # 计算移动后的新位置
-        new_positions = []
-        if direction == "up":
-            new_positions = [(i-1, j) for (i, j) in block_positions]
-        elif direction == "down":
-            new_positions = [(i+1, j) for (i, j) in block_positions]
-        elif direction == "left":
-            new_positions = [(i, j-1) for (i, j) in block_positions]
-        elif direction == "right":
-            new_positions = [(i, j+1) for (i, j) in block_positions]
+        di, dj = DIRECTION_OFFSETS.get(direction, (0, 0))
+        new_positions = [(i + di, j + dj) for (i, j) in block_positions]
 
         # 检查移动是否合法
         if not self.is_move_valid(block_positions, new_positions):
             return False
 
+        # 方块移动前后覆盖的区域需要重绘
+        self.mark_cells_dirty(block_positions + new_positions)
+
         # 执行移动
         for (i, j) in block_positions:
             self.board[i][j] = 0
@@ -531,6 +654,11 @@ class Game:
                 idx = block_positions.index(self.selected_cell)
                 self.selected_cell = new_positions[idx]
 
+        # 增量更新方块位置索引，整体平移不改变行优先顺序
+        self.block_cells[self.selected_block] = new_positions
+        min_i, max_i, min_j, max_j = self.block_bounds[self.selected_block]
+        self.block_bounds[self.selected_block] = (min_i + di, max_i + di, min_j + dj, max_j + dj)
+
         # 检查胜利条件
         self.check_win()
         return True        
@@ -556,20 +684,10 @@ class Game:
 
     def is_board_valid(self):
         # 检查棋盘是否有效（方块连通性等）
-        # 获取所有非零方块
-        blocks = set()
-        for row in self.board:
-            blocks.update(row)
-        blocks.discard(0)
-        blocks.discard(99)  # 不检查墙体的连通性
-
-        # 检查每个方块是否连通
-        for block in blocks:
-            positions = []
-            for i in range(self.rows):
-                for j in range(self.cols):
-                    if self.board[i][j] == block:
-                        positions.append((i, j))
+        # 检查每个方块是否连通，位置直接读取索引
+        for block, positions in self.block_cells.items():
+            if block == 99:  # 不检查墙体的连通性
+                continue
             if not self.is_block_connected(positions):
                 return False
         return True
@@ -578,6 +696,7 @@ class Game:
         # 检查方块是否连通
         if not positions:
             return True
+        position_set = set(positions)
         visited = set()
         queue = [positions[0]]
         visited.add(positions[0])
@@ -586,13 +705,21 @@ class Game:
             i, j = queue.pop(0)
             for di, dj in directions:
                 ni, nj = i + di, j + dj
-                if (ni, nj) in positions and (ni, nj) not in visited:
+                if (ni, nj) in position_set and (ni, nj) not in visited:
                     visited.add((ni, nj))
                     queue.append((ni, nj))
         return len(visited) == len(positions)
 
     def check_win(self):
         # 检查是否胜利：起点和终点之间有一条连通的路径
+        was_win = self.win
+        self._update_win()
+        # 胜利信息显示或消失时整屏重绘
+        if self.win != was_win:
+            self.mark_all_dirty()
+
+    def _update_win(self):
+        # 更新胜利状态
         if not self.start_point or not self.end_point:
             self.win = False
             return
@@ -613,6 +740,7 @@ class Game:
     def set_start_point(self, point):
         # 设置起点
         self.start_point = point
+        self.mark_all_dirty()
         # 确保targets列表中包含所有目标点
         if not self.targets:
             self.targets = [self.start_point]
@@ -622,6 +750,7 @@ class Game:
     def set_end_point(self, point):
         # 设置终点
         self.end_point = point
+        self.mark_all_dirty()
         # 确保targets列表中包含所有目标点
         if not self.targets:
             self.targets = [self.start_point, self.end_point]
@@ -664,6 +793,10 @@ class Game:
     def get_state(self):
         # 获取当前游戏状态（用于求解器）
         return tuple(tuple(row) for row in self.board)
+
+    def to_board(self) -> Board:
+        # 转换为不依赖pygame的纯数据棋盘模型，供求解器使用
+        return Board(self.rows, self.cols, [row[:] for row in self.board], list(self.targets))
     
     # 计时器管理
     def start_user_solve_timer(self):
@@ -703,11 +836,7 @@ class Game:
         
     def get_formatted_time(self, seconds):
         # 格式化时间为 分:秒.毫秒
-        minutes = int(seconds // 60)
-        remaining_seconds = seconds % 60
-        seconds_int = int(remaining_seconds)
-        milliseconds = int((remaining_seconds - seconds_int) * 1000)
-        return f"{minutes:02d}:{seconds_int:02d}.{milliseconds:03d}"
+        return format_time(seconds)
         
     def get_user_solve_time_formatted(self):
         # 获取格式化的用户求解时间
@@ -0,0 +1,222 @@
+# 关卡生成器文件
+# 随机生成方块布局和墙体，先用廉价检查淘汰无解或过于简单的棋盘，
+# 再用BFS求出最优步数并按步数排序，多进程并行，结果按现有JSON格式写入题库
+import os
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import deque
+from typing import Optional
+from board import Board, WALL
+from solver import Solver
+from levels import LevelManager
+from utils import canonical_level_hash
+
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+# 工作进程中题库已有关卡的规范哈希，由_init_worker在进程启动时设置一次，不随每个批次重复传送
+_known_hashes = frozenset()
+
+
+def random_layout(rng: random.Random, rows: int, cols: int, wall_ratio: float,
+                  block_count: int, max_block_size: int) -> Board:
+    """
+    随机生成一个棋盘布局
+    :param rng: 随机数生成器
+    :param rows: 棋盘行数
+    :param cols: 棋盘列数
+    :param wall_ratio: 墙体占格子总数的比例
+    :param block_count: 方块数量
+    :param max_block_size: 单个方块的最大格子数
+    :return: 棋盘模型
+    """
+    cells = [[0 for _ in range(cols)] for _ in range(rows)]
+    all_positions = [(i, j) for i in range(rows) for j in range(cols)]
+
+    # 起点和终点取曼哈顿距离较远的两个格子
+    min_distance = (rows + cols) // 2
+    while True:
+        start, end = rng.sample(all_positions, 2)
+        if abs(start[0] - end[0]) + abs(start[1] - end[1]) >= min_distance:
+            break
+
+    # 放置墙体，不占用起点和终点
+    wall_candidates = [pos for pos in all_positions if pos != start and pos != end]
+    for i, j in rng.sample(wall_candidates, int(len(all_positions) * wall_ratio)):
+        cells[i][j] = WALL
+
+    # 逐个生长连通的方块
+    for block in range(1, block_count + 1):
+        free = [(i, j) for (i, j) in all_positions if cells[i][j] == 0]
+        if not free:
+            break
+        size = rng.randint(1, max_block_size)
+        seed_cell = rng.choice(free)
+        shape = [seed_cell]
+        cells[seed_cell[0]][seed_cell[1]] = block
+        while len(shape) < size:
+            frontier = [(i + di, j + dj) for (i, j) in shape for di, dj in DIRECTIONS
+                        if 0 <= i + di < rows and 0 <= j + dj < cols and cells[i + di][j + dj] == 0]
+            if not frontier:
+                break
+            ni, nj = rng.choice(frontier)
+            cells[ni][nj] = block
+            shape.append((ni, nj))
+
+    return Board(rows, cols, cells, [start, end])
+
+
+def quick_reject(board: Board) -> Optional[str]:
+    """
+    廉价的第一轮筛选，不做状态空间搜索
+    :param board: 棋盘模型
+    :return: 淘汰原因；通过筛选时返回None
+    """
+    start, end = board.start_point, board.end_point
+    cells = board.cells
+
+    # 只考虑墙体时起点和终点都不连通，必然无解
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        i, j = queue.popleft()
+        for di, dj in DIRECTIONS:
+            ni, nj = i + di, j + dj
+            if 0 <= ni < board.rows and 0 <= nj < board.cols and (ni, nj) not in seen and cells[ni][nj] != WALL:
+                seen.add((ni, nj))
+                queue.append((ni, nj))
+    if end not in seen:
+        return "unsolvable"
+
+    # 初始状态或任意一步之后即到达目标，过于简单
+    solver = Solver(board)
+    state = board.get_state()
+    if solver.is_goal_state(state):
+        return "trivial"
+    for block in solver.get_blocks(state):
+        for direction in ("up", "down", "left", "right"):
+            new_state = solver.move_block(state, block, direction)
+            if new_state and solver.is_goal_state(new_state):
+                return "trivial"
+    return None
+
+
+def _init_worker(known_hashes: frozenset):
+    # 进程池初始化：题库哈希集合只在每个工作进程启动时传送一次
+    global _known_hashes
+    _known_hashes = known_hashes
+
+
+def generate_batch(seed: int, attempts: int, rows: int, cols: int, wall_ratio: float,
+                   block_count: int, max_block_size: int, min_moves: int, state_limit: int,
+                   known_hashes: Optional[frozenset] = None):
+    """
+    工作进程入口：生成一批候选棋盘并求出最优步数
+    :param known_hashes: 题库中已有关卡的规范哈希，重复的候选不再求解；默认使用_init_worker设置的集合
+    :return: (通过的关卡列表[(步数, 行列, 棋盘, 目标点, 规范哈希)], 统计字典)
+    """
+    if known_hashes is None:
+        known_hashes = _known_hashes
+    cpu_start = time.process_time()
+    rng = random.Random(seed)
+    stats = {"attempts": attempts, "unsolvable": 0, "trivial": 0, "duplicate": 0, "too_easy": 0,
+             "no_solution": 0, "limit_reached": 0, "accepted": 0}
+    accepted = []
+    seen_hashes = set()
+    for _ in range(attempts):
+        board = random_layout(rng, rows, cols, wall_ratio, block_count, max_block_size)
+        reason = quick_reject(board)
+        if reason is not None:
+            stats[reason] += 1
+            continue
+        # 与题库或本批次已有关卡重复的候选直接跳过，省去一次求解
+        level_hash = canonical_level_hash(board.cells, board.targets)
+        if level_hash in known_hashes or level_hash in seen_hashes:
+            stats["duplicate"] += 1
+            continue
+        seen_hashes.add(level_hash)
+        solver = Solver(board, state_limit=state_limit)
+        solution = solver.solve()
+        if solution is None:
+            stats["limit_reached" if solver.limit_reached else "no_solution"] += 1
+        elif len(solution) < min_moves:
+            stats["too_easy"] += 1
+        else:
+            stats["accepted"] += 1
+            accepted.append((len(solution), (rows, cols), board.cells, board.targets, level_hash))
+    stats["cpu_time"] = time.process_time() - cpu_start
+    return accepted, stats
+
+
+def generate_levels(count: int, rows: int, cols: int, wall_ratio: float = 0.1, block_count: int = 6,
+                    max_block_size: int = 4, min_moves: int = 8, state_limit: int = 200000,
+                    workers: int = None, batch_size: int = 50, seed: int = 0, max_batches: int = 1000,
+                    known_hashes=()):
+    """
+    多进程生成难题，直到找到count个不少于min_moves步的关卡或达到批次上限
+    :param known_hashes: 需要排除的已有关卡规范哈希
+    :return: (按最优步数从多到少排序的关卡列表, 汇总统计)
+    """
+    workers = workers or os.cpu_count() or 1
+    known_hashes = frozenset(known_hashes)
+    totals = {}
+    found = []
+    found_hashes = set()
+    submitted = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(known_hashes,)) as executor:
+        pending = set()
+        while len(found) < count and (pending or submitted < max_batches):
+            # 保持每个工作进程都有任务
+            while len(pending) < workers * 2 and submitted < max_batches:
+                pending.add(executor.submit(generate_batch, seed + submitted, batch_size, rows, cols, wall_ratio,
+                                            block_count, max_block_size, min_moves, state_limit))
+                submitted += 1
+            done = next(as_completed(pending))
+            pending.discard(done)
+            accepted, stats = done.result()
+            # 不同批次之间也可能生成相同的关卡
+            for level in accepted:
+                if level[4] in found_hashes:
+                    stats["duplicate"] += 1
+                    stats["accepted"] -= 1
+                else:
+                    found_hashes.add(level[4])
+                    found.append(level)
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        for future in pending:
+            future.cancel()
+    found.sort(key=lambda level: level[0], reverse=True)
+    cpu_hours = totals.get("cpu_time", 0) / 3600
+    totals["levels_per_cpu_hour"] = len(found) / cpu_hours if cpu_hours > 0 else 0.0
+    return found[:count], totals
+
+
+# 命令行用法：python generator.py --count 20 --rows 5 --cols 5 --min-moves 10
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量生成华容道难题")
+    parser.add_argument("--count", type=int, default=10, help="需要的关卡数量")
+    parser.add_argument("--rows", type=int, default=5, help="棋盘行数")
+    parser.add_argument("--cols", type=int, default=5, help="棋盘列数")
+    parser.add_argument("--walls", type=float, default=0.1, help="墙体比例")
+    parser.add_argument("--blocks", type=int, default=6, help="方块数量")
+    parser.add_argument("--max-block-size", type=int, default=4, help="单个方块最大格子数")
+    parser.add_argument("--min-moves", type=int, default=8, help="最少最优步数")
+    parser.add_argument("--state-limit", type=int, default=200000, help="单题BFS状态数上限")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认CPU核数")
+    parser.add_argument("--batch-size", type=int, default=50, help="每批候选数量")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--out", default="levels", help="输出目录")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    level_manager = LevelManager(args.out)
+    levels, totals = generate_levels(args.count, args.rows, args.cols, args.walls, args.blocks,
+                                     args.max_block_size, args.min_moves, args.state_limit,
+                                     args.workers, args.batch_size, args.seed,
+                                     known_hashes=level_manager.level_hashes.keys())
+    for index, (moves, board_size, cells, targets, _) in enumerate(levels, 1):
+        level_manager.save_level(board_size, cells, targets, f"generated_{moves}_{index}")
+    print(f"找到 {len(levels)} 个关卡，最优步数: {[level[0] for level in levels]}")
+    print(f"统计: {totals}")
+    print(f"墙钟时间: {time.time() - start_time:.2f} 秒，每CPU小时难题数: {totals['levels_per_cpu_hour']:.1f}")
@@ -0,0 +1,139 @@
+# 二进制关卡包文件
+# 将大量关卡打包为一个紧凑的二进制文件，通过mmap随机访问，读取第N关时只复制该关卡的数据
+import os
+import sys
+import json
+import mmap
+import struct
+from typing import Dict, Iterable, List
+
+# 关卡包格式（小端）：
+#   文件头    <4s H H I>   魔数、版本、保留、关卡数量
+#   偏移表    关卡数量 x <Q>，每个关卡记录在文件中的起始位置
+#   关卡记录  <B B B B B B H> 行数、列数、起点行列、终点行列、名称字节数
+#             名称（UTF-8），随后为行数x列数个格子，每个格子一个有符号字节
+MAGIC = b"KLPK"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHHI")
+OFFSET = struct.Struct("<Q")
+RECORD_HEADER = struct.Struct("<BBBBBBH")
+PACK_SUFFIX = ".klp"
+
+
+def _encode_level(level: Dict) -> bytes:
+    # 将关卡字典编码为一条关卡记录
+    rows, cols = level["board_size"]
+    (start_i, start_j), (end_i, end_j) = level["targets"][:2]
+    name = level["name"].encode("utf-8")
+    cells = [cell for row in level["board"] for cell in row]
+    if len(cells) != rows * cols:
+        raise ValueError(f"关卡 {level['name']} 的棋盘大小与board_size不一致")
+    header = RECORD_HEADER.pack(rows, cols, start_i, start_j, end_i, end_j, len(name))
+    return header + name + struct.pack(f"<{len(cells)}b", *cells)
+
+
+def write_level_pack(path: str, levels: Iterable[Dict]) -> int:
+    """
+    将关卡写入二进制关卡包
+    :param path: 关卡包路径
+    :param levels: 关卡字典序列，格式与JSON关卡文件一致
+    :return: 写入的关卡数量
+    """
+    records = [_encode_level(level) for level in levels]
+    offset = FILE_HEADER.size + OFFSET.size * len(records)
+    with open(path, "wb") as f:
+        f.write(FILE_HEADER.pack(MAGIC, VERSION, 0, len(records)))
+        for record in records:
+            f.write(OFFSET.pack(offset))
+            offset += len(record)
+        for record in records:
+            f.write(record)
+    return len(records)
+
+
+class LevelPack:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"不是有效的关卡包文件: {path}")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int) -> Dict:
+        return self.get_level(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def _read_header(self, index: int):
+        # 读取关卡记录头，返回(记录头字段, 名称起始位置)
+        if not 0 <= index < self.count:
+            raise IndexError(f"关卡序号超出范围: {index}")
+        offset = OFFSET.unpack_from(self._mmap, FILE_HEADER.size + OFFSET.size * index)[0]
+        return RECORD_HEADER.unpack_from(self._mmap, offset), offset + RECORD_HEADER.size
+
+    def get_metadata(self, index: int) -> Dict:
+        # 只读取关卡名称、大小和目标点，不读取棋盘
+        (rows, cols, start_i, start_j, end_i, end_j, name_length), name_offset = self._read_header(index)
+        return {
+            "name": self._mmap[name_offset:name_offset + name_length].decode("utf-8"),
+            "board_size": [rows, cols],
+            "targets": [[start_i, start_j], [end_i, end_j]]
+        }
+
+    def get_level(self, index: int) -> Dict:
+        # 读取完整关卡，格式与JSON关卡文件一致
+        (rows, cols, _, _, _, _, name_length), name_offset = self._read_header(index)
+        level = self.get_metadata(index)
+        cells = struct.unpack_from(f"<{rows * cols}b", self._mmap, name_offset + name_length)
+        level["board"] = [list(cells[i * cols:(i + 1) * cols]) for i in range(rows)]
+        return level
+
+
+def json_to_pack(json_paths: List[str], pack_path: str) -> int:
+    # 将若干JSON关卡文件转换为一个关卡包
+    levels = []
+    for path in json_paths:
+        with open(path, "r") as f:
+            levels.append(json.load(f))
+    return write_level_pack(pack_path, levels)
+
+
+def pack_to_json(pack_path: str, out_dir: str) -> int:
+    # 将关卡包展开为JSON关卡文件
+    os.makedirs(out_dir, exist_ok=True)
+    with LevelPack(pack_path) as pack:
+        for index in range(len(pack)):
+            level = pack.get_level(index)
+            with open(os.path.join(out_dir, f"{level['name']}.json"), "w") as f:
+                json.dump(level, f, indent=4)
+        return len(pack)
+
+
+# 命令行用法：
+#   python level_pack.py pack levels/*.json out.klp
+#   python level_pack.py unpack out.klp levels
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "pack":
+        count = json_to_pack(sys.argv[2:-1], sys.argv[-1])
+        print(f"已将 {count} 个关卡写入 {sys.argv[-1]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "unpack":
+        count = pack_to_json(sys.argv[2], sys.argv[3])
+        print(f"已将 {count} 个关卡展开到 {sys.argv[3]}")
+    else:
+        print("用法: python level_pack.py pack <关卡.json...> <关卡包.klp>")
+        print("      python level_pack.py unpack <关卡包.klp> <输出目录>")
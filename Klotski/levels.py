@@ -1,39 +1,215 @@
 import json
 import os
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+from utils import canonical_level_hash
+from level_pack import LevelPack, PACK_SUFFIX, write_level_pack
+
+# 题库清单文件：每行一条JSON记录，只追加写入
+#   关卡记录  {"file", "name", "board_size", "hash", "mtime_ns", "size"}，关卡包中的关卡另有"index"
+#   删除记录  {"file", "deleted": true}，删除该文件的所有关卡
+# 同一文件的后写记录覆盖先写记录，冗余记录过多时整体压缩重写
+# 启动时逐个比较文件的修改时间和大小（只stat，不读取内容），只重新解析有变化的文件，
+# 因此原地修改关卡文件也能被发现；目录的修改时间在原地修改文件时不变，不能用来判断
+MANIFEST_NAME = "manifest.jsonl"
+# 清单中冗余记录超过有效记录数的该倍数时压缩
+MANIFEST_COMPACT_RATIO = 2
+# 清单记录中保存的字段
+MANIFEST_FIELDS = ("file", "index", "name", "board_size", "hash", "mtime_ns", "size")
+
+
+def _entry_key(entry: Dict) -> str:
+    # 清单记录的唯一键：JSON关卡为文件名，关卡包中的关卡为"文件名#序号"
+    if "index" in entry:
+        return f"{entry['file']}#{entry['index']}"
+    return entry["file"]
+
+
+def _manifest_record(entry: Dict) -> Dict:
+    return {key: entry[key] for key in MANIFEST_FIELDS if key in entry}
+
 
 class LevelManager:
-    def __init__(self):
-        self.levels_dir = "levels"
+    def __init__(self, levels_dir: str = "levels"):
+        self.levels_dir = levels_dir
+        self.manifest_path = os.path.join(levels_dir, MANIFEST_NAME)
+        # 关卡元数据列表（名称、大小、哈希、文件名），棋盘内容在get_level时才读取
         self.levels = []
+        # 清单中的全部记录（记录键 -> 记录），包括因与已有关卡重复而未加入题库的关卡
+        self.entries = {}
+        # 关卡名称集合和规范哈希索引（哈希 -> 关卡名称），查重为O(1)
+        self.level_names = set()
+        self.level_hashes = {}
+        # 清单中的记录行数，用于判断是否需要压缩
+        self.manifest_lines = 0
+        # 已打开的关卡包（文件名 -> LevelPack）
+        self.packs = {}
         # 确保levels目录存在
         if not os.path.exists(self.levels_dir):
             os.makedirs(self.levels_dir)
         self.load_levels()
 
     def load_levels(self):
-        # 加载所有关卡
-        self.levels = []
-        if not os.path.exists(self.levels_dir):
-            return
-        for filename in os.listdir(self.levels_dir):
-            if filename.endswith(".json"):
+        # 从清单加载关卡元数据，再按各文件的修改时间和大小做增量更新
+        self._set_entries(self._read_manifest() or {})
+        self.refresh_index()
+
+    def refresh_index(self):
+        """
+        增量更新清单：只解析新增或修改时间、大小有变化的关卡文件（JSON或关卡包），删除已不存在的记录
+        启动时自动调用；程序运行期间在外部修改了关卡文件后需再次调用
+        """
+        # 文件名 -> 该文件中的关卡记录（JSON文件只有一条）
+        known = {}
+        for level in self.entries.values():
+            known.setdefault(level["file"], []).append(level)
+        files = {}
+        changed = []
+        # 本次重新解析的关卡记录键，其中与已有关卡重复的会提示
+        parsed = set()
+        for dir_entry in sorted(os.scandir(self.levels_dir), key=lambda e: e.name):
+            if not dir_entry.name.endswith((".json", PACK_SUFFIX)) or not dir_entry.is_file():
+                continue
+            stat = dir_entry.stat()
+            file_entries = known.get(dir_entry.name)
+            if not file_entries or file_entries[0]["mtime_ns"] != stat.st_mtime_ns or file_entries[0]["size"] != stat.st_size:
                 try:
-                    with open(os.path.join(self.levels_dir, filename), "r") as f:
-                        level = json.load(f)
-                        self.levels.append(level)
+                    file_entries = self._parse_file(dir_entry.name, stat)
                 except Exception as e:
-                    print(f"加载关卡 {filename} 失败: {e}")
+                    print(f"加载关卡 {dir_entry.name} 失败: {e}")
+                    continue
+                if dir_entry.name in known:
+                    # 文件被修改：先删除旧记录再写入新记录
+                    changed.append({"file": dir_entry.name, "deleted": True})
+                changed.extend(_manifest_record(entry) for entry in file_entries)
+                parsed.update(_entry_key(entry) for entry in file_entries)
+            files[dir_entry.name] = file_entries
+        removed = [name for name in known if name not in files]
+        # 保持已有关卡的顺序，新增关卡排在后面
+        ordered = {name: files[name] for name in known if name in files}
+        ordered.update(files)
+        self._set_entries({_entry_key(entry): entry for file_entries in ordered.values() for entry in file_entries},
+                          parsed)
+        records = changed + [{"file": name, "deleted": True} for name in removed]
+        if records or not os.path.exists(self.manifest_path):
+            self._append_manifest(records)
+
+    def _parse_file(self, filename: str, stat) -> List[Dict]:
+        # 解析关卡文件，生成清单记录
+        if filename.endswith(PACK_SUFFIX):
+            self._close_pack(filename)
+            entries = []
+            with LevelPack(os.path.join(self.levels_dir, filename)) as pack:
+                for index in range(len(pack)):
+                    entry = self._make_entry(filename, pack.get_level(index), stat)
+                    entry["index"] = index
+                    entries.append(entry)
+            return entries
+        with open(os.path.join(self.levels_dir, filename), "r") as f:
+            level = json.load(f)
+        return [self._make_entry(filename, level, stat)]
+
+    def _make_entry(self, filename: str, level: Dict, stat) -> Dict:
+        # 根据关卡内容生成清单记录
+        return {
+            "file": filename,
+            "name": level["name"],
+            "board_size": level["board_size"],
+            "hash": canonical_level_hash(level["board"], level["targets"]),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size
+        }
+
+    def _close_pack(self, filename: str):
+        pack = self.packs.pop(filename, None)
+        if pack is not None:
+            pack.close()
+
+    def _set_entries(self, entries: Dict[str, Dict], parsed=()):
+        # 用清单记录重建关卡列表和索引；直接放入题库目录的文件（JSON或关卡包）不经过save_level，
+        # 其中与前面的关卡重复的关卡在这里跳过（清单仍保留其记录），parsed中的记录键跳过时提示
+        self.entries = entries
+        self.levels = []
+        self.level_names = set()
+        self.level_hashes = {}
+        for key, entry in entries.items():
+            duplicate = self.level_hashes.get(entry["hash"])
+            if duplicate is not None:
+                if key in parsed:
+                    print(f"{key} 中的关卡 {entry['name']} 与已有关卡 {duplicate} 重复，未加入题库")
+                continue
+            self._add_level(entry)
+
+    def _add_level(self, entry: Dict):
+        # 将关卡加入列表并更新名称和哈希索引
+        self.levels.append(entry)
+        self.level_names.add(entry["name"])
+        self.level_hashes.setdefault(entry["hash"], entry["name"])
+
+    def _read_manifest(self) -> Optional[Dict[str, Dict]]:
+        # 读取清单，返回记录键 -> 记录，清单不存在或损坏时返回None
+        if not os.path.exists(self.manifest_path):
+            return None
+        entries = {}
+        self.manifest_lines = 0
+        try:
+            with open(self.manifest_path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    self.manifest_lines += 1
+                    record = json.loads(line)
+                    if "dir_mtime_ns" in record:
+                        # 旧版清单的目录记录，已不再使用
+                        continue
+                    if record.get("deleted"):
+                        for key in [key for key, entry in entries.items() if entry["file"] == record["file"]]:
+                            del entries[key]
+                    else:
+                        entries[_entry_key(record)] = record
+        except (OSError, ValueError) as e:
+            print(f"读取题库清单失败，重新扫描: {e}")
+            return None
+        return entries
+
+    def _append_manifest(self, records: List[Dict]):
+        # 追加写入清单记录
+        if self.manifest_lines > MANIFEST_COMPACT_RATIO * len(self.entries) + 100:
+            self._write_manifest()
+            return
+        with open(self.manifest_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.manifest_lines += len(records)
+
+    def _write_manifest(self):
+        # 压缩清单：只保留每个关卡的最新记录
+        with open(self.manifest_path, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(_manifest_record(entry), ensure_ascii=False) + "\n")
+        self.manifest_lines = len(self.entries)
+
+    def find_duplicate(self, board: List[List[int]], targets) -> Optional[str]:
+        """
+        查找题库中与给定棋盘相同的关卡（忽略方块编号、镜像和旋转）
+        :param board: 游戏棋盘
+        :param targets: 起点和终点
+        :return: 重复关卡的名称，没有重复时返回None
+        """
+        return self.level_hashes.get(canonical_level_hash(board, targets))
 
     def save_level(self, board_size: Tuple[int, int], board: List[List[int]], targets: Tuple[Tuple[int, int]], name: str = None):
-        # 保存关卡
+        # 保存关卡，题库中已有相同内容的关卡时拒绝保存并返回False
+        duplicate = self.find_duplicate(board, targets)
+        if duplicate is not None:
+            print(f"关卡与已有关卡 {duplicate} 重复，未保存")
+            return False
         if name is None:
             name = f"level_{len(self.levels) + 1}"
         else:
             # 确保名称不重复
             original_name = name
             count = 1
-            while any(level['name'] == name for level in self.levels):
+            while name in self.level_names:
                 name = f"{original_name}_{count}"
                 count += 1
         level = {
@@ -42,16 +218,60 @@ class LevelManager:
             "board": board,
             "targets": targets
         }
-        filename = os.path.join(self.levels_dir, f"{name}.json")
-        with open(filename, "w") as f:
+        filename = f"{name}.json"
+        path = os.path.join(self.levels_dir, filename)
+        with open(path, "w") as f:
             json.dump(level, f, indent=4)
-        self.levels.append(level)
+        # 增量更新清单，新关卡的棋盘内容已在内存中
+        entry = self._make_entry(filename, level, os.stat(path))
+        self.entries[_entry_key(entry)] = entry
+        self._add_level(entry)
+        entry["board"] = board
+        entry["targets"] = targets
+        self._append_manifest([_manifest_record(entry)])
         return True
 
+    def export_pack(self, path: str, indices: List[int] = None) -> int:
+        """
+        将题库中的关卡导出为二进制关卡包，用于分发或导入其他题库
+        :param path: 关卡包路径，不能在本题库目录下（否则每个关卡都会重复载入）
+        :param indices: 要导出的关卡序号，默认导出全部
+        :return: 导出的关卡数量
+        """
+        if os.path.realpath(os.path.dirname(os.path.abspath(path))) == os.path.realpath(self.levels_dir):
+            raise ValueError(f"不能把关卡包导出到题库目录 {self.levels_dir}")
+        if indices is None:
+            indices = range(len(self.levels))
+        return write_level_pack(path, (self.get_level(index) for index in indices))
+
+    def import_level(self, path: str) -> bool:
+        """
+        从外部JSON文件导入关卡，与题库中已有关卡重复时拒绝导入
+        :param path: 关卡文件路径
+        :return: 是否导入成功
+        """
+        with open(path, "r") as f:
+            level = json.load(f)
+        return self.save_level(level["board_size"], level["board"], level["targets"], level.get("name"))
+
     def get_level(self, index: int) -> Dict:
-        # 获取指定关卡
+        # 获取指定关卡，首次访问时才读取棋盘内容
         if 0 <= index < len(self.levels):
-            return self.levels[index]
+            entry = self.levels[index]
+            if "board" not in entry:
+                if "index" in entry:
+                    # 关卡包通过mmap只读取该关卡的数据
+                    pack = self.packs.get(entry["file"])
+                    if pack is None:
+                        pack = LevelPack(os.path.join(self.levels_dir, entry["file"]))
+                        self.packs[entry["file"]] = pack
+                    level = pack.get_level(entry["index"])
+                else:
+                    with open(os.path.join(self.levels_dir, entry["file"]), "r") as f:
+                        level = json.load(f)
+                entry["board"] = level["board"]
+                entry["targets"] = level["targets"]
+            return entry
         return None
 
     def has_levels(self) -> bool:
@@ -60,4 +280,4 @@ class LevelManager:
 
     def get_level_count(self) -> int:
         # 获取关卡数量
-        return len(self.levels)
\ No newline at end of file
+        return len(self.levels)
@@ -1,8 +1,13 @@
 import pygame
 import sys
+import os
 from game import Game
 from solver import Solver
+from solver_service import solve_with_service, ServiceError
+from progress import format_progress
 from levels import LevelManager
+from text_cache import text_cache
+from retrograde import load_distance_table
 from constants import *
 
 class KlotskiApp:
@@ -13,8 +18,8 @@ class KlotskiApp:
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption(GAME_TITLE)
         self.clock = pygame.time.Clock()
-        # 字体设置
-        self.font = get_font()
+        # 字体设置（字体只解析一次，由全局文本缓存共享）
+        self.font = text_cache.get_font()
         self.level_manager = LevelManager()
         self.game = None
         self.solver = None
@@ -31,6 +36,14 @@ class KlotskiApp:
         self.input_cols = ""
         self.input_state = "rows"
         self.solution = None
+        # 当前关卡名称，以及下一步提示使用的逆向距离表（None表示提示关闭）
+        self.current_level_name = None
+        self.hint_table = None
+        # 脏矩形记录：界面层（侧边栏等）需要重绘的区域
+        self.dirty_rects = []
+        self.full_redraw = True
+        # 上一次绘制时的界面状态，状态切换时整屏重绘
+        self.drawn_state = None
         # 初始化默认的Game对象，避免None值引用问题
         self.game = Game(self.board_size, mode="create")
 
@@ -39,7 +52,13 @@ class KlotskiApp:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+            elif event.type in REDRAW_EVENTS:
+                # 窗口被遮挡或恢复后，屏幕内容需要完整重绘
+                self.full_redraw = True
             elif event.type == pygame.KEYDOWN:
+                if self.state != "create_level":
+                    # 菜单类界面内容少，任何按键都整屏重绘
+                    self.full_redraw = True
                 if self.state == "menu":
                     if event.key == pygame.K_UP:
                         self.selected_option = (self.selected_option - 1) % len(self.menu_options)
@@ -69,20 +88,22 @@ class KlotskiApp:
                                     self.board_size = (rows, cols)
                                 else:
                                     # 显示错误：数字必须在2-9之间
-                                    error_text = self.font.render(TEXT_MESSAGES["INVALID_NUMBER"], True, RED)
+                                    error_text = text_cache.render(TEXT_MESSAGES["INVALID_NUMBER"], RED)
                                     self.screen.blit(error_text, (self.width//2 - error_text.get_width()//2, 300))
                                     pygame.display.flip()
                                     pygame.time.delay(1000)
+                                    self.full_redraw = True
                                     return
                             # 直接按回车，使用默认的5x5棋盘
-                            self.game = Game(self.board_size, mode="create")
+                            self.start_game(Game(self.board_size, mode="create"))
                             self.state = "create_level"
                         except ValueError:
                             # 显示错误：请输入有效数字
-                            error_text = self.font.render(TEXT_MESSAGES["INPUT_NUMBER"], True, RED)
+                            error_text = text_cache.render(TEXT_MESSAGES["INPUT_NUMBER"], RED)
                             self.screen.blit(error_text, (self.width//2 - error_text.get_width()//2, 300))
                             pygame.display.flip()
                             pygame.time.delay(1000)
+                            self.full_redraw = True
                     elif event.key == pygame.K_TAB:
                         self.input_state = "cols" if self.input_state == "rows" else "rows"
                     elif event.key == pygame.K_BACKSPACE:
@@ -110,29 +131,46 @@ class KlotskiApp:
                         )
                         if success:
                             print(f"关卡已保存: {level_name}")
+                            self.current_level_name = self.level_manager.levels[-1]["name"]
+                            # 切换到解题模式后侧边栏帮助和提示都会变化
+                            self.full_redraw = True
                             # 锁定棋盘，切换到解题模式
                             self.game.board_locked = True
                             self.game.mode = "solve"
                             # 启动用户求解计时器
                             self.game.start_user_solve_timer()
+                        else:
+                            duplicate = self.level_manager.find_duplicate(self.game.board, self.game.targets)
+                            self.set_solution(f"题库中已有相同关卡\n{duplicate}")
                     elif event.key == pygame.K_SPACE and self.game and (self.game.mode == "solve" or (self.game.mode == "create" and self.game.level_complete)):
-                        # 自动求解
-                        solver = Solver(self.game)
-                        solution = solver.solve()
-                        if solution is not None:
-                            if len(solution) == 0:
-                                self.solution = "初始状态已经是目标状态，无需移动"
-                                print("初始状态已经是目标状态，无需移动")
-                            else:
-                                formatted_solution = solver.format_solution(solution)
-                                self.solution = formatted_solution
-                                print(f"求解结果: {formatted_solution}")
+                        # 自动求解：本地求解服务（solver_service）运行时交给服务，否则在本进程内求解
+                        solver = Solver(self.game.to_board())
+                        try:
+                            solution = solve_with_service(solver, on_progress=self.show_progress)
+                        except ServiceError as e:
+                            # 服务出错或超时未响应时提示用户，不在本进程内重新求解
+                            self.set_solution(f"求解服务出错\n{e}")
+                            print(f"求解服务出错: {e}")
                         else:
-                            self.solution = "无解"
-                            print("无解")
+                            if solution is not None:
+                                if len(solution) == 0:
+                                    self.set_solution("初始状态已经是目标状态，无需移动")
+                                    print("初始状态已经是目标状态，无需移动")
+                                else:
+                                    formatted_solution = solver.format_solution(solution)
+                                    self.set_solution(formatted_solution)
+                                    print(f"求解结果: {formatted_solution}")
+                            else:
+                                self.set_solution("无解")
+                                print("无解")
+                    elif event.key == pygame.K_h and self.game and self.game.mode == "solve":
+                        # H键开关下一步提示
+                        self.toggle_hints()
                     else:
                         # 传递键盘事件给游戏处理
                         self.game.handle_keyboard(event)
+                        if self.hint_table is not None:
+                            self.update_hint()
                 elif self.state == "select_level":
                     if event.key == pygame.K_ESCAPE:
                         self.state = "menu"
@@ -143,34 +181,146 @@ class KlotskiApp:
                     elif event.key == pygame.K_RETURN:
                         # 选择关卡并进入解题模式
                         if self.level_manager.levels:
-                            level_data = self.level_manager.levels[self.selected_level]
+                            # 棋盘内容在选中关卡时才从文件读取
+                            level_data = self.level_manager.get_level(self.selected_level)
                             board_size = level_data["board_size"]
                             board = level_data["board"]
                             targets = level_data["targets"]
                             # 创建新的游戏实例并设置为解题模式
-                            self.game = Game(board_size, mode="solve", board=board, targets=targets)
+                            self.start_game(Game(board_size, mode="solve", board=board, targets=targets))
+                            self.current_level_name = level_data["name"]
                             self.game.board_locked = True
                             # 启动用户求解计时器
                             self.game.start_user_solve_timer()
                             self.state = "create_level"  # 复用create_level状态进行显示
                 # 其他状态的事件处理...
 
+    def start_game(self, game):
+        # 切换到新的棋盘，淘汰与上一关卡相关的文本缓存
+        self.game = game
+        self.current_level_name = None
+        self.close_hint_table()
+        text_cache.evict("level")
+        self.set_solution(None)
+
+    def get_hint_table_path(self):
+        # 当前关卡对应的距离表文件（由retrograde.py离线生成）
+        if self.current_level_name is None:
+            return None
+        return os.path.join(self.level_manager.levels_dir, f"{self.current_level_name}.dist")
+
+    def toggle_hints(self):
+        # 开关下一步提示，打开时载入当前关卡的距离表
+        if self.hint_table is not None:
+            self.close_hint_table()
+            self.set_solution(None)
+            return
+        table_path = self.get_hint_table_path()
+        if table_path is None or not os.path.exists(table_path):
+            self.set_solution("未找到距离表\n请先运行retrograde.py生成")
+            return
+        try:
+            self.hint_table = load_distance_table(table_path)
+        except (OSError, ValueError):
+            self.set_solution("距离表无效\n请重新运行retrograde.py生成")
+            return
+        self.update_hint()
+
+    def close_hint_table(self):
+        # 关闭距离表文件的内存映射
+        if self.hint_table is not None:
+            self.hint_table.close()
+            self.hint_table = None
+
+    def update_hint(self):
+        # 每次操作后查询距离表，给出下一步最优移动
+        distance = self.hint_table.get_distance(self.game.get_state())
+        move = self.hint_table.next_move(self.game.to_board())
+        if move is not None:
+            block, direction = move
+            self.set_solution(f"提示: {block}{DIRECTION_MAP[direction]}\n剩余最少步数: {distance}")
+        elif distance == 0:
+            self.set_solution("已到达目标状态")
+        else:
+            self.set_solution("当前状态无解或不在距离表中")
+
+    def show_progress(self, event):
+        # 本进程内求解时在侧边栏显示搜索进度，并处理窗口事件避免界面无响应
+        # 侧边栏较窄，每项单独一行
+        self.set_solution("求解中…\n" + format_progress(event).replace("，", "\n"))
+        self.render_frame()
+        pygame.event.pump()
+
+    def set_solution(self, solution):
+        # 更新求解结果，并淘汰旧求解结果的文本缓存
+        if solution != self.solution:
+            text_cache.evict("solution")
+            if self.game:
+                self.dirty_rects.append(self.get_sidebar_rect())
+        self.solution = solution
+
+    def get_sidebar_rect(self):
+        # 右侧快捷键帮助侧边栏所在区域
+        sidebar_x = self.margin + self.game.cols * self.game.cell_size + 20
+        sidebar_y = self.margin
+        sidebar_width = self.width - sidebar_x - self.margin
+        sidebar_height = self.height - 2 * self.margin
+        return pygame.Rect(sidebar_x, sidebar_y, sidebar_width, sidebar_height)
+
+    def pop_dirty_rects(self):
+        """
+        汇总界面层和棋盘的脏矩形，并清空记录
+        :return: None表示需要整屏重绘，否则为需要重绘的矩形列表
+        """
+        full_redraw = self.full_redraw or self.state != self.drawn_state
+        rects = self.dirty_rects
+        if self.state == "create_level" and self.game:
+            game_rects = self.game.pop_dirty_rects()
+            if game_rects is None:
+                full_redraw = True
+            else:
+                rects = rects + game_rects
+        self.full_redraw = False
+        self.dirty_rects = []
+        self.drawn_state = self.state
+        return None if full_redraw else rects
+
+    def render_frame(self):
+        # 只重绘发生变化的区域，没有变化时不做任何绘制
+        rects = self.pop_dirty_rects()
+        if rects is None:
+            self.draw()
+            pygame.display.flip()
+        elif rects:
+            status_rect = self.game.get_status_rect()
+            if self.state == "create_level" and all(status_rect.contains(rect) for rect in rects):
+                # 只有状态栏（计时）变化：只重绘状态栏，不重绘棋盘和侧边栏
+                self.screen.set_clip(status_rect)
+                self.screen.fill((240, 240, 240))
+                self.game.draw_status_bar(self.screen)
+            else:
+                # 按所有脏矩形的并集裁剪，保证重叠元素按原有顺序绘制
+                self.screen.set_clip(rects[0].unionall(rects[1:]))
+                self.draw()
+            self.screen.set_clip(None)
+            pygame.display.update(rects)
+
     def draw(self):
         self.screen.fill((240, 240, 240))
         if self.state == "menu":
             # 绘制菜单
-            title = self.font.render("华容道游戏", True, (0, 0, 0))
+            title = text_cache.render("华容道游戏", (0, 0, 0))
             self.screen.blit(title, (self.width//2 - title.get_width()//2, 100))
             for i, option in enumerate(self.menu_options):
                 color = (255, 0, 0) if i == self.selected_option else (0, 0, 0)
-                text = self.font.render(option, True, color)
+                text = text_cache.render(option, color)
                 self.screen.blit(text, (self.width//2 - text.get_width()//2, 200 + i * 50))
         elif self.state == "input_board_size":
             # 绘制棋盘大小输入界面
-            title = self.font.render("请输入棋盘大小", True, (0, 0, 0))
+            title = text_cache.render("请输入棋盘大小", (0, 0, 0))
             self.screen.blit(title, (self.width//2 - title.get_width()//2, 100))
 
-            row_text = self.font.render("行数: ", True, (0, 0, 0))
+            row_text = text_cache.render("行数: ", (0, 0, 0))
             self.screen.blit(row_text, (self.width//2 - 150, 200))
             row_input = self.font.render(self.input_rows, True, (0, 0, 0))
             self.screen.blit(row_input, (self.width//2 - 50, 200))
@@ -178,7 +328,7 @@ class KlotskiApp:
                 pygame.draw.rect(self.screen, (255, 0, 0), 
                                 (self.width//2 - 50, 200, row_input.get_width() + 10, 30), 2)
 
-            col_text = self.font.render("列数: ", True, (0, 0, 0))
+            col_text = text_cache.render("列数: ", (0, 0, 0))
             self.screen.blit(col_text, (self.width//2 - 150, 250))
             col_input = self.font.render(self.input_cols, True, (0, 0, 0))
             self.screen.blit(col_input, (self.width//2 - 50, 250))
@@ -186,7 +336,7 @@ class KlotskiApp:
                 pygame.draw.rect(self.screen, (255, 0, 0), 
                                 (self.width//2 - 50, 250, col_input.get_width() + 10, 30), 2)
 
-            hint = self.font.render("按Tab切换输入，Enter确认", True, (100, 100, 100))
+            hint = text_cache.render("按Tab切换输入，Enter确认", (100, 100, 100))
             self.screen.blit(hint, (self.width//2 - hint.get_width()//2, 350))
         elif self.state == "create_level":
             # 绘制游戏界面
@@ -194,10 +344,7 @@ class KlotskiApp:
                 self.game.draw(self.screen)
                 
                 # 绘制右侧快捷键帮助侧边栏
-                sidebar_x = self.margin + self.game.cols * self.game.cell_size + 20
-                sidebar_y = self.margin
-                sidebar_width = self.width - sidebar_x - self.margin
-                sidebar_height = self.height - 2 * self.margin
+                sidebar_x, sidebar_y, sidebar_width, sidebar_height = self.get_sidebar_rect()
                 
                 # 绘制侧边栏背景
                 pygame.draw.rect(self.screen, (220, 220, 220), 
@@ -205,10 +352,8 @@ class KlotskiApp:
                 pygame.draw.rect(self.screen, (0, 0, 0), 
                                 (sidebar_x, sidebar_y, sidebar_width, sidebar_height), 2, border_radius=4)
                 
-                # 绘制侧边栏标题
-                # 创建一个较小的字体用于侧边栏
-                sidebar_font = pygame.font.SysFont(["SimHei", "Microsoft YaHei", "WenQuanYi Micro Hei"], 24)
-                title = sidebar_font.render("快捷键帮助", True, (0, 0, 0))
+                # 绘制侧边栏标题（侧边栏使用较小的字号）
+                title = text_cache.render("快捷键帮助", (0, 0, 0), SIDEBAR_FONT_SIZE)
                 self.screen.blit(title, (sidebar_x + sidebar_width//2 - title.get_width()//2, sidebar_y + 10))
                 
                 # 绘制快捷键说明
@@ -218,47 +363,50 @@ class KlotskiApp:
                     help_texts = HELP_TEXTS["solve"]
                 
                 for i, text in enumerate(help_texts):
-                    help_text = sidebar_font.render(text, True, (0, 0, 0))
+                    help_text = text_cache.render(text, (0, 0, 0), SIDEBAR_FONT_SIZE)
                     self.screen.blit(help_text, (sidebar_x + 10, sidebar_y + 50 + i * 25))
                 
                 # 显示求解结果
                 if hasattr(self, 'solution') and self.solution:
-                    solution_title = sidebar_font.render("求解结果:", True, (0, 0, 0))
+                    solution_title = text_cache.render("求解结果:", (0, 0, 0), SIDEBAR_FONT_SIZE)
                     self.screen.blit(solution_title, (sidebar_x + 10, sidebar_y + 50 + len(help_texts) * 25 + 10))
                     
                     # 显示解决方案的步骤（支持多行）
                     solution_lines = self.solution.split('\n')
                     for i, line in enumerate(solution_lines):
-                        solution_text = sidebar_font.render(line, True, (0, 0, 0))
+                        solution_text = text_cache.render(line, (0, 0, 0), SIDEBAR_FONT_SIZE, scope="solution")
                         self.screen.blit(solution_text, (sidebar_x + 10, sidebar_y + 50 + len(help_texts) * 25 + 40 + i * 25))
         elif self.state == "select_level":
             # 绘制关卡选择界面
-            title = self.font.render("选择关卡", True, (0, 0, 0))
+            title = text_cache.render("选择关卡", (0, 0, 0))
             self.screen.blit(title, (self.width//2 - title.get_width()//2, 100))
             
             # 绘制关卡列表
             if self.level_manager.levels:
-                for i, level in enumerate(self.level_manager.levels):
+                # 只绘制选中关卡附近的一屏，题库很大时绘制开销不变
+                level_count = self.level_manager.get_level_count()
+                first = max(0, min(self.selected_level - VISIBLE_LEVEL_COUNT // 2, level_count - VISIBLE_LEVEL_COUNT))
+                for row, i in enumerate(range(first, min(first + VISIBLE_LEVEL_COUNT, level_count))):
+                    level = self.level_manager.levels[i]
                     color = (255, 0, 0) if i == self.selected_level else (0, 0, 0)
                     level_name = level["name"]
                     level_size = level["board_size"]
-                    level_text = self.font.render(f"{level_name} ({level_size[0]}x{level_size[1]})", True, color)
-                    self.screen.blit(level_text, (self.width//2 - level_text.get_width()//2, 200 + i * 50))
+                    level_text = text_cache.render(f"{level_name} ({level_size[0]}x{level_size[1]})", color)
+                    self.screen.blit(level_text, (self.width//2 - level_text.get_width()//2, 200 + row * 50))
                     
-                hint = self.font.render("上下方向键选择，Enter确认，Esc返回", True, (100, 100, 100))
+                hint = text_cache.render("上下方向键选择，Enter确认，Esc返回", (100, 100, 100))
                 self.screen.blit(hint, (self.width//2 - hint.get_width()//2, self.height - 100))
             else:
-                empty_text = self.font.render("题库为空，请先创建关卡", True, (100, 100, 100))
+                empty_text = text_cache.render("题库为空，请先创建关卡", (100, 100, 100))
                 self.screen.blit(empty_text, (self.width//2 - empty_text.get_width()//2, 300))
-                back_hint = self.font.render("按Esc返回菜单", True, (100, 100, 100))
+                back_hint = text_cache.render("按Esc返回菜单", (100, 100, 100))
                 self.screen.blit(back_hint, (self.width//2 - back_hint.get_width()//2, self.height - 100))
         # 其他状态的绘制...
 
     def run(self):
         while True:
             self.handle_events()
-            self.draw()
-            pygame.display.flip()
+            self.render_frame()
             self.clock.tick(60)
 
 if __name__ == "__main__":
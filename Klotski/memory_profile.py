@@ -0,0 +1,114 @@
+# 内存分析文件
+# 可选的求解内存分析模式：求解期间用tracemalloc跟踪内存分配，结束时记录
+#   memory_peak         求解期间的峰值内存（相对开始时的增量，字节）
+#   memory_current      求解结束时仍占用的内存（相对开始时的增量，字节）
+#   memory_structures   各数据结构（已访问状态、队列、路径、g值等）占用的字节数
+#   memory_per_state    每个已存储状态平均占用的字节数（各数据结构之和 / 状态数）
+#   memory_top_allocations  增长最多的分配位置 [(文件:行号, 字节数, 对象数), ...]
+# 用于比较状态编码等改动前后的内存占用。tracemalloc会使求解明显变慢，只在分析时开启
+import sys
+import types
+import tracemalloc
+from collections import deque
+from typing import Dict, Iterable
+
+# 记录的分配位置数
+TOP_ALLOCATIONS = 5
+# 只统计对象本身、不展开内部引用的类型
+_OPAQUE_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+                 types.MethodType, types.CodeType)
+
+
+def measure_structures(structures: Dict[str, Iterable]) -> Dict[str, int]:
+    """
+    统计各数据结构递归占用的字节数
+    多个数据结构共用的对象（如行元组、状态）只计入第一个引用它的数据结构，因此结果之和不重复计算
+    :param structures: 名称 -> 该数据结构的根对象列表，按计入顺序排列
+    :return: 名称 -> 字节数
+    """
+    seen = set()
+    sizes = {}
+    for name, roots in structures.items():
+        size = 0
+        stack = list(roots)
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            size += sys.getsizeof(obj)
+            if isinstance(obj, _OPAQUE_TYPES):
+                continue
+            if isinstance(obj, dict):
+                stack.extend(obj.keys())
+                stack.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+                stack.extend(obj)
+            else:
+                # 自定义对象：展开实例字典和__slots__中的属性
+                if hasattr(obj, "__dict__"):
+                    stack.append(obj.__dict__)
+                slots = getattr(type(obj), "__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+        sizes[name] = size
+    return sizes
+
+
+class MemoryProfiler:
+    """求解开始时调用start，结束时调用finish把内存统计写入求解器的统计信息"""
+    def __init__(self):
+        # 是否由本分析器启动了tracemalloc（外部已在跟踪时不停止）
+        self.started = False
+        self.baseline = 0
+        self.snapshot = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        tracemalloc.reset_peak()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        self.snapshot = self.take_snapshot()
+
+    @staticmethod
+    def take_snapshot():
+        # 排除tracemalloc自身的分配
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def finish(self, stats: Dict, structures: Dict[str, Iterable], state_count: int):
+        """
+        记录内存统计信息
+        :param stats: 求解器的统计信息，写入memory_*字段
+        :param structures: 名称 -> 根对象列表，见measure_structures
+        :param state_count: 已存储的状态数
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        top = self.take_snapshot().compare_to(self.snapshot, "lineno")[:TOP_ALLOCATIONS]
+        self.snapshot = None
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
+        sizes = measure_structures(structures)
+        stats["memory_peak"] = peak - self.baseline
+        stats["memory_current"] = current - self.baseline
+        stats["memory_structures"] = sizes
+        stats["memory_per_state"] = sum(sizes.values()) / state_count if state_count else 0.0
+        stats["memory_top_allocations"] = [(f"{diff.traceback[0].filename}:{diff.traceback[0].lineno}",
+                                            diff.size_diff, diff.count_diff) for diff in top]
+
+
+def format_memory_stats(stats: Dict) -> str:
+    # 内存统计的文字描述，没有开启内存分析时返回空字符串
+    if "memory_peak" not in stats:
+        return ""
+    lines = [f"峰值内存: {stats['memory_peak'] / 1024 / 1024:.2f} MB, "
+             f"结束时占用: {stats['memory_current'] / 1024 / 1024:.2f} MB, "
+             f"每个状态: {stats['memory_per_state']:.1f} 字节"]
+    for name, size in stats["memory_structures"].items():
+        lines.append(f"  {name}: {size / 1024 / 1024:.2f} MB")
+    for location, size, count in stats["memory_top_allocations"]:
+        lines.append(f"  分配位置 {location}: {size / 1024 / 1024:.2f} MB, {count} 个对象")
+    return "\n".join(lines)
@@ -0,0 +1,26 @@
+# 偏序约简文件
+# 两个移动属于不同方块、且各自离开和进入的格子互不重叠时，两种先后顺序到达同一状态。
+# 规定这类可交换的移动只按方块编号从小到大的顺序生成，另一种顺序直接跳过；
+# 同一状态以相同的最少步数被多次到达时，取所有到达移动的并集再判断，保证不丢失最短解
+# 移动的足迹掩码由移动表（move_tables.TableMove.footprint_mask）提供
+from typing import Sequence, Tuple
+
+# 到达移动：(方块编号, 足迹掩码)
+Arrival = Tuple[int, int]
+
+
+def is_redundant(block: int, footprint: int, arrivals: Sequence[Arrival]) -> bool:
+    """
+    判断移动能否跳过：对每一个到达移动，该移动都与之可交换且方块编号更小
+    （此时先走该移动再走到达移动的路径等长且会被生成）
+    :param block: 待生成移动的方块编号
+    :param footprint: 待生成移动的足迹掩码
+    :param arrivals: 以最少步数到达当前状态的所有移动；初始状态为空
+    :return: 是否可以跳过
+    """
+    if not arrivals:
+        return False
+    for arrival_block, arrival_footprint in arrivals:
+        if block >= arrival_block or footprint & arrival_footprint:
+            return False
+    return True
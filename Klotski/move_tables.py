@@ -0,0 +1,126 @@
+# 移动表文件
+# 棋盘大小和墙体位置确定后，某个形状的方块从某个位置向某个方向移动一格时，
+# 进入和离开的格子永远不变。按棋盘几何缓存这些移动表，判断移动是否合法时
+# 只需检查进入的几个格子是否为空，同一几何的关卡在多次求解之间共用一份表
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from board_analysis import WALL_VALUES
+
+# 最多缓存的棋盘几何数量，超过后丢弃最早建立的表
+MAX_CACHED_TABLES = 64
+
+
+class TableMove:
+    """某个形状从某个位置向某个方向移动一格的预计算结果"""
+    __slots__ = ("entering", "leaving", "entering_mask", "changed_mask", "footprint_mask", "row_changes")
+
+    def __init__(self, cells, moved, cols):
+        # 移动后新占据的格子、移动后空出的格子
+        self.entering = tuple(sorted(moved - cells))
+        self.leaving = tuple(sorted(cells - moved))
+        # 进入格子的位掩码（按 行*列数+列 编码），可与占用掩码按位与判断是否被挡住
+        self.entering_mask = sum(1 << (i * cols + j) for i, j in self.entering)
+        # 占用状态翻转的格子（进入和离开的格子），与占用掩码或方块掩码异或即得移动后的掩码
+        self.changed_mask = self.entering_mask | sum(1 << (i * cols + j) for i, j in self.leaving)
+        # 足迹：移动前后方块占据的所有格子，用于偏序约简判断两个移动是否可交换
+        self.footprint_mask = sum(1 << (i * cols + j) for i, j in cells | moved)
+        # 按行分组的格子改动：(行, ((列, 是否被方块占据), ...))，生成新状态时只重建这些行
+        changes = {}
+        for i, j in self.leaving:
+            changes.setdefault(i, []).append((j, False))
+        for i, j in self.entering:
+            changes.setdefault(i, []).append((j, True))
+        self.row_changes = tuple((i, tuple(cells)) for i, cells in sorted(changes.items()))
+
+
+class MoveTable:
+    def __init__(self, rows: int, cols: int, walls: FrozenSet[Tuple[int, int]]):
+        self.rows = rows
+        self.cols = cols
+        self.walls = walls
+        # 形状（相对首格的偏移元组） -> 形状编号
+        self.shape_ids: Dict[tuple, int] = {}
+        self.shapes: List[tuple] = []
+        # (形状编号, 首格位置, 行偏移, 列偏移) -> TableMove；超出棋盘或撞墙的移动为None
+        self.moves: Dict[tuple, Optional[TableMove]] = {}
+
+    def get_shape_id(self, positions: List[Tuple[int, int]]) -> int:
+        """
+        获取方块形状的编号，形状相同（平移后重合）的方块共用移动表
+        :param positions: 方块的所有位置，按行优先顺序排列
+        :return: 形状编号
+        """
+        anchor_i, anchor_j = positions[0]
+        shape = tuple((i - anchor_i, j - anchor_j) for i, j in positions)
+        shape_id = self.shape_ids.get(shape)
+        if shape_id is None:
+            shape_id = len(self.shapes)
+            self.shape_ids[shape] = shape_id
+            self.shapes.append(shape)
+        return shape_id
+
+    def get_move(self, shape_id: int, anchor: Tuple[int, int], di: int, dj: int) -> Optional[TableMove]:
+        """
+        查询移动表，首次查询时计算并缓存
+        :param shape_id: 形状编号
+        :param anchor: 方块首格的当前位置
+        :param di: 行偏移
+        :param dj: 列偏移
+        :return: 移动的进入和离开格子；移动会超出棋盘或撞墙时返回None
+        """
+        key = (shape_id, anchor, di, dj)
+        if key in self.moves:
+            return self.moves[key]
+        cells = {(anchor[0] + si, anchor[1] + sj) for si, sj in self.shapes[shape_id]}
+        moved = {(i + di, j + dj) for i, j in cells}
+        move = None
+        if all(0 <= i < self.rows and 0 <= j < self.cols and (i, j) not in self.walls for i, j in moved):
+            move = TableMove(cells, moved, self.cols)
+        self.moves[key] = move
+        return move
+
+
+# 棋盘几何 (行数, 列数, 墙体位置) -> MoveTable
+_tables: Dict[tuple, MoveTable] = {}
+
+
+def get_move_table(state) -> MoveTable:
+    """
+    获取棋盘几何对应的移动表，相同几何的关卡共用缓存
+    :param state: 棋盘状态（二维列表或元组），只读取其中的墙体
+    :return: 移动表
+    """
+    rows, cols = len(state), len(state[0])
+    walls = frozenset((i, j) for i in range(rows) for j in range(cols) if state[i][j] in WALL_VALUES)
+    key = (rows, cols, walls)
+    table = _tables.get(key)
+    if table is None:
+        if len(_tables) >= MAX_CACHED_TABLES:
+            del _tables[next(iter(_tables))]
+        table = MoveTable(rows, cols, walls)
+        _tables[key] = table
+    return table
+
+
+def is_move_free(state, move: TableMove) -> bool:
+    # 移动进入的格子都为空时移动合法
+    for i, j in move.entering:
+        if state[i][j] != 0:
+            return False
+    return True
+
+
+def apply_table_move(state, block: int, move: TableMove):
+    """
+    执行移动，返回新状态（元组的元组），未改动的行与原状态共用
+    :param state: 当前状态
+    :param block: 方块编号
+    :param move: 已确认合法的移动
+    :return: 新状态
+    """
+    new_state = list(state)
+    for i, cells in move.row_changes:
+        row = list(state[i])
+        for j, occupied in cells:
+            row[j] = block if occupied else 0
+        new_state[i] = tuple(row)
+    return tuple(new_state)
@@ -0,0 +1,68 @@
+# 求解进度文件
+# 求解引擎可以作为生成器使用：按时间间隔产出进度事件，最后产出结果事件。
+# 界面、服务和命令行消费同一个事件流；不需要进度时间隔为None，不产生任何事件
+#   进度事件  {"type": "progress", "engine", "depth"或"f_bound", "frontier", "visited",
+#              "expanded", "nodes_per_sec", "elapsed"}
+#   结果事件  {"type": "result", ...}，字段见各引擎
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+# 默认进度事件间隔（秒）
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+
+class ProgressReporter:
+    def __init__(self, engine: str, interval: Optional[float] = DEFAULT_PROGRESS_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last = self.start
+
+    def due(self) -> bool:
+        # 距上次进度事件已超过间隔；间隔为None时从不产生事件
+        return self.interval is not None and time.monotonic() - self.last >= self.interval
+
+    def event(self, expanded: int, **fields) -> Dict:
+        """
+        生成进度事件
+        :param expanded: 已扩展的节点数，用于计算平均每秒扩展节点数
+        :param fields: 引擎相关的字段（深度或f值界限、Open表大小、已访问状态数）
+        :return: 进度事件
+        """
+        self.last = time.monotonic()
+        elapsed = self.last - self.start
+        return dict(type="progress", engine=self.engine, expanded=expanded,
+                    nodes_per_sec=expanded / elapsed if elapsed > 0 else 0.0, elapsed=elapsed, **fields)
+
+
+def run_to_result(events: Iterator[Dict]) -> Dict:
+    # 消费事件流，返回最后的结果事件
+    event = None
+    for event in events:
+        pass
+    return event
+
+
+def format_progress(event: Dict) -> str:
+    # 进度事件的单行文字描述，供命令行和界面显示
+    if "depth" in event:
+        bound = f"深度 {event['depth']}"
+    else:
+        bound = f"f界限 {event['f_bound']}"
+    return (f"{bound}，待扩展 {event['frontier']}，已访问 {event['visited']}，"
+            f"{event['nodes_per_sec']:.0f} 节点/秒，{event['elapsed']:.1f} 秒")
+
+
+async def iterate_async(events: Iterator[Dict]) -> AsyncIterator[Dict]:
+    """
+    把求解事件流转换为异步迭代器：每一步在线程池中推进，事件循环不被搜索阻塞
+    :param events: 引擎的事件生成器
+    """
+    loop = asyncio.get_running_loop()
+    done = object()
+    while True:
+        event = await loop.run_in_executor(None, next, events, done)
+        if event is done:
+            return
+        yield event
@@ -0,0 +1,244 @@
+# 逆向距离表文件
+# 离线枚举关卡的全部可达状态，记录每个状态到目标状态的精确步数，
+# 解题时只需查询当前状态各个后继的距离即可给出下一步提示，无需任何搜索
+import os
+import sys
+import json
+import mmap
+import struct
+from collections import deque
+from typing import Dict, Optional, Tuple
+from board import Board
+from solver import Solver
+
+# 距离表文件格式：
+#   文件头  <4s B B B B I>  魔数、版本、行数、列数、距离字节宽度、状态数
+#   状态区  按字节序排序的状态编码，每个状态rows*cols字节，每个格子一个字节
+#   距离区  与状态区一一对应的距离，宽度为1或2字节（小端）
+MAGIC = b"KLDT"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBI")
+# 与任何目标状态都不连通的状态
+UNREACHABLE = 0xFFFF
+DIRECTIONS = ["up", "down", "left", "right"]
+
+
+def encode_state(state) -> bytes:
+    # 将状态（元组的元组）编码为定长字节串，每个格子一个字节
+    return bytes(cell for row in state for cell in row)
+
+
+def iter_successors(solver: Solver, state):
+    # 枚举状态的所有后继：(方块编号, 方向, 新状态)
+    for block in solver.get_blocks(state):
+        for direction in DIRECTIONS:
+            new_state = solver.move_block(state, block, direction)
+            if new_state:
+                yield block, direction, new_state
+
+
+class DistanceLookup:
+    """距离表的公共查询接口：子类提供lookup（按状态编码查询原始距离）和__len__"""
+    rows: int
+    cols: int
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def lookup(self, key: bytes) -> Optional[int]:
+        # 按状态编码查询原始距离，不在表中时返回None
+        raise NotImplementedError
+
+    def __contains__(self, state) -> bool:
+        # 状态是否在表中（包括与目标不连通的状态）
+        return self.lookup(encode_state(state)) is not None
+
+    def close(self):
+        pass
+
+    def get_distance(self, state) -> Optional[int]:
+        """
+        查询状态到目标状态的最少步数
+        :param state: 棋盘状态（二维列表或元组）
+        :return: 步数；状态不在表中或与目标不连通时返回None
+        """
+        distance = self.lookup(encode_state(state))
+        if distance is None or distance == UNREACHABLE:
+            return None
+        return distance
+
+    def next_move(self, board: Board) -> Optional[Tuple[int, str]]:
+        """
+        给出下一步最优移动，只查询当前状态各个后继的距离
+        :param board: 当前棋盘
+        :return: (方块编号, 方向)；已到达目标、状态未知或无解时返回None
+        """
+        state = board.get_state()
+        distance = self.get_distance(state)
+        if not distance:
+            return None
+        solver = Solver(board)
+        for block, direction, new_state in iter_successors(solver, state):
+            if self.get_distance(new_state) == distance - 1:
+                return block, direction
+        return None
+
+
+class DistanceTable(DistanceLookup):
+    """build_distance_table生成的距离表，保存在内存字典中，可以写入文件；读取文件见load_distance_table"""
+    def __init__(self, rows: int, cols: int, distances: Dict[bytes, int]):
+        self.rows = rows
+        self.cols = cols
+        # 状态编码 -> 到目标状态的最少步数
+        self.distances = distances
+
+    def __len__(self):
+        return len(self.distances)
+
+    def lookup(self, key: bytes) -> Optional[int]:
+        return self.distances.get(key)
+
+    def save(self, path: str):
+        # 以紧凑的索引格式写入文件，状态按字节序排列便于二分查找
+        keys = sorted(self.distances)
+        width = 1 if all(d < 0xFF or d == UNREACHABLE for d in self.distances.values()) else 2
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.rows, self.cols, width, len(keys)))
+            for key in keys:
+                f.write(key)
+            for key in keys:
+                distance = self.distances[key]
+                if width == 1:
+                    f.write(bytes((0xFF if distance == UNREACHABLE else distance,)))
+                else:
+                    f.write(struct.pack("<H", distance))
+
+
+class MappedDistanceTable(DistanceLookup):
+    """
+    内存映射的只读距离表文件：在按字节序排列的定长状态区上二分查找，
+    打开文件与查询的内存开销都与状态数无关，只有被访问的页会读入内存
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            # 空文件不能映射，按无效文件处理
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f"不是有效的距离表文件: {path}")
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, cols, width, count = HEADER.unpack_from(self.data, 0)
+        area = rows * cols
+        if (magic != MAGIC or version != VERSION or width not in (1, 2)
+                or len(self.data) < HEADER.size + count * (area + width)):
+            self.data.close()
+            raise ValueError(f"不是有效的距离表文件: {path}")
+        self.rows = rows
+        self.cols = cols
+        self.area = area
+        self.width = width
+        self.count = count
+        self.keys_start = HEADER.size
+        self.values_start = self.keys_start + count * area
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, key: bytes) -> Optional[int]:
+        # 在定长状态区上二分查找，找到后读取距离区中对应的距离
+        data, area, start = self.data, self.area, self.keys_start
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            offset = start + mid * area
+            if data[offset:offset + area] < key:
+                low = mid + 1
+            else:
+                high = mid
+        offset = start + low * area
+        if low == self.count or data[offset:offset + area] != key:
+            return None
+        if self.width == 1:
+            distance = data[self.values_start + low]
+            return UNREACHABLE if distance == 0xFF else distance
+        return struct.unpack_from("<H", data, self.values_start + low * 2)[0]
+
+    def close(self):
+        # 关闭内存映射，之后不能再查询
+        self.data.close()
+
+
+def load_distance_table(path: str) -> MappedDistanceTable:
+    """
+    以内存映射方式打开距离表文件，不把状态读入内存
+    :param path: DistanceTable.save写入的文件
+    :return: 只读距离表，用完后调用close
+    :raises ValueError: 文件不是有效的距离表
+    """
+    return MappedDistanceTable(path)
+
+
+def build_distance_table(board: Board) -> DistanceTable:
+    """
+    逆向分析：枚举关卡的全部可达状态，并从所有目标状态出发做多源BFS，
+    得到每个状态到最近目标状态的精确步数（移动可逆，状态图为无向图）
+    :param board: 关卡初始棋盘
+    :return: 距离表
+    """
+    solver = Solver(board)
+    start_state = board.get_state()
+
+    # 第一遍：正向BFS枚举所有可达状态，同时记录目标状态
+    seen = {start_state}
+    queue = deque([start_state])
+    goals = []
+    while queue:
+        state = queue.popleft()
+        if solver.is_goal_state(state):
+            goals.append(state)
+        for _, _, new_state in iter_successors(solver, state):
+            if new_state not in seen:
+                seen.add(new_state)
+                queue.append(new_state)
+
+    # 第二遍：从所有目标状态出发的多源BFS
+    distances = {state: 0 for state in goals}
+    queue = deque(goals)
+    while queue:
+        state = queue.popleft()
+        distance = distances[state] + 1
+        for _, _, new_state in iter_successors(solver, state):
+            if new_state not in distances:
+                distances[new_state] = distance
+                queue.append(new_state)
+
+    encoded = {encode_state(state): distances.get(state, UNREACHABLE) for state in seen}
+    return DistanceTable(board.rows, board.cols, encoded)
+
+
+def get_table_path(level_path: str) -> str:
+    # 关卡文件对应的距离表文件路径
+    return os.path.splitext(level_path)[0] + ".dist"
+
+
+def load_or_build(board: Board, table_path: str) -> DistanceLookup:
+    # 优先读取已生成的距离表，不存在时现场生成并保存
+    if os.path.exists(table_path):
+        table = load_distance_table(table_path)
+        # 关卡被修改过时初始状态不在表中，需要重新生成
+        if board.get_state() in table:
+            return table
+        table.close()
+    table = build_distance_table(board)
+    table.save(table_path)
+    return table
+
+
+# 离线生成：python retrograde.py levels/custom_level_1.json ...
+if __name__ == "__main__":
+    for level_path in sys.argv[1:]:
+        with open(level_path, "r") as f:
+            level = json.load(f)
+        table = build_distance_table(Board.from_level(level))
+        table_path = get_table_path(level_path)
+        table.save(table_path)
+        start_distance = table.get_distance(Board.from_level(level).get_state())
+        print(f"{level_path}: {len(table)} 个状态，初始状态距离 {start_distance}，已写入 {table_path}")
@@ -1,27 +1,84 @@
-from game import Game
+import time
 from typing import List, Tuple, Dict, Set, Optional
 from collections import deque
-import heapq
-from constants import DIRECTION_MAP
+from board import Board
+from utils import format_time
+from zobrist import ZobristTable, ZobristMap
+from board_analysis import analyze_block_mobility, find_relevant_blocks
+from move_order import is_redundant
+from move_tables import get_move_table, is_move_free, apply_table_move
+from checkpoint import Checkpointer, DEFAULT_CHECKPOINT_INTERVAL
+from progress import ProgressReporter, DEFAULT_PROGRESS_INTERVAL, run_to_result
+from memory_profile import MemoryProfiler
+
+# 方向 -> (行偏移, 列偏移)，与constants.DIRECTION_OFFSETS一致（求解器不依赖pygame）
+DIRECTION_OFFSETS = {
+    "up": (-1, 0),
+    "down": (1, 0),
+    "left": (0, -1),
+    "right": (0, 1)
+}
 
 class Solver:
-    def __init__(self, game: Game):
-        self.game = game
-        self.rows = game.rows
-        self.cols = game.cols
-        self.targets = game.targets
+    def __init__(self, board: Board, state_limit: Optional[int] = None, partial_order: bool = True,
+                 checkpoint_path: Optional[str] = None, checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+                 corridor: Optional[Set[Tuple[int, int]]] = None, profile_memory: bool = False):
+        # 求解器只依赖纯数据棋盘模型，界面层的Game通过to_board()转换后传入
+        self.board = board
+        self.rows = board.rows
+        self.cols = board.cols
+        self.targets = board.targets
+        self.start_point = board.start_point
+        self.end_point = board.end_point
+        # 访问状态数上限，超过后放弃搜索（None表示不限制），用于批量生成关卡时控制单题耗时
+        self.state_limit = state_limit
+        self.limit_reached = False
+        # 是否启用偏序约简（跳过可交换移动的重复顺序）
+        self.partial_order = partial_order
+        # 检查点文件路径（None表示不保存检查点）和保存间隔（秒）；
+        # 文件中已有同一关卡的检查点时从中恢复搜索，求解结束后删除
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        # 预先算好的起点到终点通路格子（批量求解时同一几何的关卡共用），None时求解时计算
+        self.corridor = corridor
+        # 是否在求解时用tracemalloc分析内存，结果记录在stats的memory_*字段中（见memory_profile）
+        self.profile_memory = profile_memory
+        # 最近一次求解的统计信息
+        self.stats = {}
+        # 当前棋盘几何的移动表（多个求解器共用缓存）和方块编号 -> 形状编号
+        self.move_table = get_move_table(board.cells)
+        self.block_shapes = {}
+        # 自动求解计时器
+        self.solve_start_time = None
+        self.solve_end_time = None
         # 初始化时不预计算目标位置
         # 删除了所有与A*算法和连通性启发式算法相关的实现
 
     def get_state(self):
         # 获取当前游戏状态
-        return tuple(tuple(row) for row in self.game.board)
+        return self.board.get_state()
+
+    def start_solve_timer(self):
+        # 开始自动求解计时器
+        self.solve_start_time = time.time()
+        self.solve_end_time = None
+
+    def stop_solve_timer(self):
+        # 停止自动求解计时器
+        if self.solve_start_time and not self.solve_end_time:
+            self.solve_end_time = time.time()
+
+    def get_solve_time(self):
+        # 获取自动求解时间（秒）
+        if not self.solve_start_time or not self.solve_end_time:
+            return 0
+        return self.solve_end_time - self.solve_start_time
 
     def is_goal_state(self, state):
         # 检查是否为目标状态
         # 直接实现BFS逻辑，避免创建Game对象和额外的函数调用开销
-        start_point = self.game.start_point
-        end_point = self.game.end_point
+        start_point = self.start_point
+        end_point = self.end_point
         
         if not start_point or not end_point:
             return False
@@ -71,38 +128,52 @@ class Solver:
         blocks.discard(99)  # 排除墙体
         return blocks
 
+    def get_block_positions(self, state) -> Dict[int, List[Tuple[int, int]]]:
+        # 一次遍历棋盘，获取所有方块（不含墙体）的位置
+        positions = {}
+        for i, row in enumerate(state):
+            for j, value in enumerate(row):
+                if value != 0 and value != 99:
+                    positions.setdefault(value, []).append((i, j))
+        return positions
+
+    def get_block_moves(self, state) -> Dict[int, List[Tuple[str, Tuple[int, int]]]]:
+        # 静态分析每个方块可能用到的方向：被墙体和边界锁死的方块没有可用方向，
+        # 只能沿一个轴移动的方块只尝试该轴上的两个方向，
+        # 与起点到终点通路无关的方块固定不动；分析结果记录在stats中
+        mobility = analyze_block_mobility(state)
+        if self.start_point and self.end_point:
+            relevant = find_relevant_blocks(state, self.start_point, self.end_point, self.corridor)
+        else:
+            relevant = set(mobility)
+        self.stats["immovable_blocks"] = sorted(block for block, offsets in mobility.items() if not offsets)
+        self.stats["pruned_blocks"] = sorted(block for block in mobility if block not in relevant)
+        return {block: [(direction, offset) for direction, offset in DIRECTION_OFFSETS.items()
+                        if offset in offsets and block in relevant]
+                for block, offsets in mobility.items()}
+
     def move_block(self, state, block, direction):
         # 尝试移动方块，返回新状态
-        # 复制状态
-        new_state = [list(row) for row in state]
-        # 找到方块的所有位置
-        block_positions = []
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if new_state[i][j] == block:
-                    block_positions.append((i, j))
-        # 计算新位置
-        new_positions = []
-        if direction == "up":
-            new_positions = [(i-1, j) for (i, j) in block_positions]
-        elif direction == "down":
-            new_positions = [(i+1, j) for (i, j) in block_positions]
-        elif direction == "left":
-            new_positions = [(i, j-1) for (i, j) in block_positions]
-        elif direction == "right":
-            new_positions = [(i, j+1) for (i, j) in block_positions]
-        # 检查移动是否合法
-        for (i, j) in new_positions:
-            if i < 0 or i >= self.rows or j < 0 or j >= self.cols:
-                return None
-            if new_state[i][j] != 0 and new_state[i][j] != block:
-                return None
-        # 执行移动
-        for (i, j) in block_positions:
-            new_state[i][j] = 0
-        for (i, j) in new_positions:
-            new_state[i][j] = block
-        return tuple(tuple(row) for row in new_state)
+        block_positions = [(i, j) for i in range(self.rows) for j in range(self.cols) if state[i][j] == block]
+        di, dj = DIRECTION_OFFSETS[direction]
+        return self.apply_move(state, block, block_positions, di, dj)
+
+    def apply_move(self, state, block, block_positions, di, dj):
+        # 按已知的方块位置尝试移动，返回新状态；移动不合法时返回None
+        # 边界和墙体由移动表预先排除，这里只需检查进入的格子是否为空
+        if not block_positions:
+            return None
+        move = self.get_table_move(block, block_positions, di, dj)
+        if move is None or not is_move_free(state, move):
+            return None
+        return apply_table_move(state, block, move)
+
+    def get_table_move(self, block, block_positions, di, dj):
+        # 查询移动表；方块形状固定，形状编号按方块编号缓存
+        shape_id = self.block_shapes.get(block)
+        if shape_id is None:
+            shape_id = self.block_shapes[block] = self.move_table.get_shape_id(block_positions)
+        return self.move_table.get_move(shape_id, block_positions[0], di, dj)
 
     def format_solution(self, solution):
         # 格式化解决方案为易读的步骤
@@ -118,7 +189,7 @@ class Solver:
         for block, direction in solution:
             steps.append(f"{block}{direction_map[direction]}")
         # 添加自动求解时间到结果中
-        solve_time = self.game.get_auto_solve_time_formatted()
+        solve_time = format_time(self.get_solve_time())
         steps.append(f"\n求解时间: {solve_time}")
         # 使用换行符分隔步骤，以便在侧边栏中正确显示
         return "\n".join(steps)
@@ -137,53 +208,152 @@ class Solver:
         
         返回值:
         - 如果有解，返回方块移动的序列
-        - 如果无解，返回None
+        - 如果无解或超过状态数上限（limit_reached为True），返回None
         """
+        return run_to_result(self.iter_solve(None))["solution"]
+
+    def iter_solve(self, progress_interval: Optional[float] = DEFAULT_PROGRESS_INTERVAL):
+        """以生成器方式执行BFS求解（见progress）
+
+        每隔progress_interval秒产出一个进度事件（depth为当前层数，frontier为队列长度），
+        最后产出结果事件 {"type": "result", "engine", "solution", "limit_reached", "stats", "elapsed"}
+        progress_interval为None时只产出结果事件
+        """
+        self.limit_reached = False
+        self.stats = {"immovable_blocks": [], "pruned_blocks": [], "visited_states": 0,
+                      "generated_states": 0, "por_skipped_moves": 0}
+        Checkpointer.init_stats(self.stats)
         # 开始自动求解计时器
-        self.game.start_auto_solve_timer()
+        self.start_solve_timer()
         
         start_state = self.get_state()
         if self.is_goal_state(start_state):
             # 停止自动求解计时器
-            self.game.stop_auto_solve_timer()
-            return []
+            self.stop_solve_timer()
+            yield self.result_event([])
+            return
+
+        profiler = None
+        if self.profile_memory:
+            profiler = MemoryProfiler()
+            profiler.start()
             
         # 初始化队列，用于BFS搜索
-        # 队列元素格式：(状态, 到达该状态的路径)
+        # 队列元素格式：(状态, 状态的Zobrist哈希, 到达该状态的路径, 以最少步数到达该状态的所有移动)
+        zobrist = ZobristTable(self.rows, self.cols)
+        start_hash = zobrist.hash_state(start_state)
         queue = deque()
-        queue.append((start_state, []))
+        queue.append((start_state, start_hash, [], []))
         
-        # 使用更高效的visited实现，将状态转换为字符串以提高哈希效率
-        visited = set()
-        start_state_str = str(start_state)
-        visited.add(start_state_str)
+        # visited以Zobrist哈希为键，新状态的哈希由移动增量更新，只在哈希相同时比较状态
+        visited = ZobristMap()
+        visited.set(start_hash, start_state, start_state)
+        block_moves = self.get_block_moves(start_state)
+        # 偏序约简：下一层状态 -> 其到达移动列表，同层重复到达时合并到达移动
+        next_layer = ZobristMap(lambda entry: entry[0])
+        depth = 0
+        expanded = 0
+        reporter = ProgressReporter("bfs", progress_interval)
+
+        checkpointer = None
+        if self.checkpoint_path:
+            checkpointer = Checkpointer(self.checkpoint_path, ("bfs", start_state, tuple(self.targets), self.partial_order),
+                                        self.checkpoint_interval)
+            saved = checkpointer.load()
+            if saved is not None:
+                # 从检查点恢复队列、已访问状态和统计信息，计时包含恢复前已用的时间
+                queue = saved["queue"]
+                visited.values, visited.collisions = saved["visited"]
+                next_layer.values, next_layer.collisions = saved["next_layer"]
+                depth = saved["depth"]
+                self.stats = saved["stats"]
+                self.stats["resumed"] = True
+                self.solve_start_time = time.time() - saved["elapsed"]
         
         while queue:
+            if reporter.due():
+                yield reporter.event(expanded, depth=depth, frontier=len(queue), visited=len(visited))
+            if checkpointer is not None and checkpointer.due():
+                # 在两次扩展之间保存，此时队列和已访问状态一致；到达移动列表与队列元素共用，一起保存
+                checkpointer.save({
+                    "queue": queue,
+                    "visited": (visited.values, visited.collisions),
+                    "next_layer": (next_layer.values, next_layer.collisions),
+                    "depth": depth,
+                    "stats": self.stats,
+                    "elapsed": time.time() - self.solve_start_time
+                }, self.stats)
+
             # 取出队列中的第一个元素
-            current_state, current_path = queue.popleft()
+            current_state, current_hash, current_path, arrivals = queue.popleft()
+            expanded += 1
+            if len(current_path) > depth:
+                # 开始扩展新的一层，该层状态的到达移动已经全部合并
+                depth = len(current_path)
+                next_layer = ZobristMap(lambda entry: entry[0])
             
             # 尝试所有可能的移动
-            blocks = self.get_blocks(current_state)
-            for block in blocks:
-                for direction in ["up", "down", "left", "right"]:
-                    # 尝试移动方块
-                    new_state = self.move_block(current_state, block, direction)
-                    if new_state:
-                        new_state_str = str(new_state)
-                        if new_state_str not in visited:
+            block_positions = self.get_block_positions(current_state)
+            for block, positions in block_positions.items():
+                for direction, (di, dj) in block_moves[block]:
+                    # 移动表已排除超出棋盘和撞墙的移动
+                    move = self.get_table_move(block, positions, di, dj)
+                    if move is None:
+                        continue
+                    footprint = move.footprint_mask
+                    if self.partial_order and is_redundant(block, footprint, arrivals):
+                        self.stats["por_skipped_moves"] += 1
+                        continue
+                    # 尝试移动方块：只需检查进入的格子是否为空
+                    if is_move_free(current_state, move):
+                        new_state = apply_table_move(current_state, block, move)
+                        self.stats["generated_states"] += 1
+                        new_hash = current_hash ^ zobrist.move_delta(block, positions, di, dj)
+                        if visited.get(new_hash, new_state) is not None:
+                            # 同层的重复到达：合并到达移动，该状态扩展时据此判断可跳过的移动
+                            entry = next_layer.get(new_hash, new_state)
+                            if entry is not None:
+                                entry[1].append((block, footprint))
+                        else:
                             # 生成新的路径
                             new_path = current_path + [(block, direction)]
                             
                             # 检查是否达到目标状态
                             if self.is_goal_state(new_state):
-                                # 停止自动求解计时器
-                                self.game.stop_auto_solve_timer()
-                                return new_path
+                                self.finish_search(visited, checkpointer, queue, next_layer, profiler)
+                                yield self.result_event(new_path)
+                                return
                             
                             # 将新状态加入队列和已访问集合
-                            queue.append((new_state, new_path))
-                            visited.add(new_state_str)
+                            new_arrivals = [(block, footprint)]
+                            queue.append((new_state, new_hash, new_path, new_arrivals))
+                            visited.set(new_hash, new_state, new_state)
+                            if self.partial_order:
+                                next_layer.set(new_hash, new_state, (new_state, new_arrivals))
+                            
+                            # 超过状态数上限时放弃搜索
+                            if self.state_limit is not None and len(visited) >= self.state_limit:
+                                self.limit_reached = True
+                                self.finish_search(visited, checkpointer, queue, next_layer, profiler)
+                                yield self.result_event(None)
+                                return
                         
-        # 停止自动求解计时器（无解的情况）
-        self.game.stop_auto_solve_timer()
-        return None  # 无解
\ No newline at end of file
+        # 无解的情况
+        self.finish_search(visited, checkpointer, queue, next_layer, profiler)
+        yield self.result_event(None)
+
+    def finish_search(self, visited, checkpointer, queue, next_layer, profiler):
+        # 搜索结束：记录访问状态数，停止自动求解计时器，记录内存统计，删除已无用的检查点
+        self.stats["visited_states"] = len(visited)
+        self.stop_solve_timer()
+        if profiler is not None:
+            # 队列中每个状态都带有完整路径，单独统计；状态本身计入visited
+            profiler.finish(self.stats, {"visited": [visited], "paths": [entry[2] for entry in queue],
+                                         "queue": [queue], "next_layer": [next_layer]}, len(visited))
+        if checkpointer is not None:
+            checkpointer.clear()
+
+    def result_event(self, solution):
+        # 求解结束时产出的结果事件
+        return {"type": "result", "engine": "bfs", "solution": solution, "limit_reached": self.limit_reached,
+                "stats": self.stats, "elapsed": self.get_solve_time()}
\ No newline at end of file
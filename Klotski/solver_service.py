@@ -0,0 +1,490 @@
+# 本地求解服务文件
+# 常驻的asyncio守护进程，通过Unix套接字（不支持时为本机TCP端口）接收求解请求，
+# 分派给预热好的进程池；相同的请求在求解期间合并为一次搜索，求解结果按LRU缓存。
+# 游戏界面、批量工具和网页前端都通过服务求解，省去每次请求的解释器启动和预计算开销。
+#
+# 协议：每个请求和响应都是一行JSON
+#   请求  {"board": [[...], ...], "targets": [[行, 列], [行, 列]], "state_limit": 可选}
+#         {"command": "stats"}  查询服务统计信息
+#   响应  {"solution": [[方块编号, 方向], ...]或null, "limit_reached", "stats", "solve_time",
+#          "cached", "coalesced"}，出错时为{"error": 错误信息}
+# 同一端口也接受HTTP请求：POST /solve（请求体为上述JSON）和 GET /stats，供网页前端使用
+#
+# 命令行用法：python solver_service.py [--socket 路径 | --port 端口] [--workers 4]
+import os
+import sys
+import json
+import stat
+import errno
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Windows没有resource模块，不能限制工作进程的内存
+    resource = None
+
+# 默认Unix套接字路径；平台不支持Unix套接字时使用本机TCP端口
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "klotski_solver.sock")
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 结果缓存的条目数上限，超过后淘汰最久未使用的结果
+DEFAULT_CACHE_SIZE = 1024
+# 单个请求行的长度上限
+MAX_REQUEST_BYTES = 1 << 20
+# 客户端等待响应的默认超时（秒）
+DEFAULT_CLIENT_TIMEOUT = 600.0
+# 每个工作进程的内存上限（MB）：超过时该请求以MemoryError失败，工作进程不会被系统因内存不足结束
+DEFAULT_WORKER_MEMORY_LIMIT = 2048
+
+
+class ServiceError(ValueError):
+    """求解服务返回了错误、超时未响应或通信中断"""
+
+
+def default_address():
+    # Unix套接字路径（字符串）或(主机, 端口)
+    return DEFAULT_SOCKET_PATH if hasattr(socket, "AF_UNIX") else (DEFAULT_HOST, DEFAULT_PORT)
+
+
+def remove_stale_socket(path: str):
+    """
+    删除上次异常退出时留下的Unix套接字文件
+    有服务正在监听该路径、或路径不是套接字文件时不删除，抛出OSError
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EEXIST, f"{path} 已存在且不是套接字文件")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except ConnectionRefusedError:
+        # 没有进程在监听，是残留的套接字文件
+        os.remove(path)
+        return
+    except FileNotFoundError:
+        return
+    finally:
+        sock.close()
+    raise OSError(errno.EADDRINUSE, f"已有求解服务在监听 {path}")
+
+
+def _warm_worker(memory_limit: Optional[int]):
+    # 工作进程启动时限制内存，并导入求解器（及其依赖的分析和移动表模块），之后的请求不再付出导入开销
+    if resource is not None and memory_limit is not None:
+        # Linux不强制RLIMIT_RSS，与solver_test一样用地址空间上限代替
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    import solver  # noqa: F401
+
+
+def _ping():
+    return os.getpid()
+
+
+def _solve_in_worker(cells: List[List[int]], targets: List[Tuple[int, int]], state_limit: Optional[int]) -> Dict:
+    # 在工作进程中求解，返回可JSON序列化的结果
+    from board import Board
+    from solver import Solver
+    board = Board(len(cells), len(cells[0]), [list(row) for row in cells], targets)
+    solver = Solver(board, state_limit=state_limit)
+    solution = solver.solve()
+    return {
+        "solution": None if solution is None else [list(step) for step in solution],
+        "limit_reached": solver.limit_reached,
+        "stats": solver.stats,
+        "solve_time": solver.get_solve_time()
+    }
+
+
+def is_index(value) -> bool:
+    # JSON中的非负整数（排除true/false，它们在Python中也是int）
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def parse_request(request: Dict):
+    """
+    校验求解请求并生成缓存键
+    :param request: 请求字典
+    :return: (棋盘, 目标点, 状态数上限, 缓存键)
+    """
+    cells = request.get("board")
+    targets = request.get("targets")
+    state_limit = request.get("state_limit")
+    if not cells or not isinstance(cells, list) or not all(isinstance(row, list) and row for row in cells):
+        raise ValueError("board必须是非空的二维数组")
+    if len({len(row) for row in cells}) != 1:
+        raise ValueError("board的每一行长度必须相同")
+    if not all(is_index(value) for row in cells for value in row):
+        raise ValueError("board中的格子必须是非负整数（0为空格，99为墙体，其余为方块编号）")
+    if not isinstance(targets, list) or len(targets) != 2:
+        raise ValueError("targets必须包含起点和终点")
+    if not all(isinstance(point, list) and len(point) == 2 and all(map(is_index, point)) for point in targets):
+        raise ValueError("targets中的每个点必须是[行, 列]两个非负整数")
+    rows, cols = len(cells), len(cells[0])
+    targets = [tuple(point) for point in targets]
+    for i, j in targets:
+        if not (0 <= i < rows and 0 <= j < cols):
+            raise ValueError(f"目标点({i}, {j})超出棋盘")
+    if state_limit is not None and (not is_index(state_limit) or state_limit == 0):
+        raise ValueError("state_limit必须是正整数")
+    key = (tuple(tuple(row) for row in cells), tuple(targets), state_limit)
+    return cells, targets, state_limit, key
+
+
+class SolverService:
+    def __init__(self, workers: Optional[int] = None, cache_size: int = DEFAULT_CACHE_SIZE,
+                 memory_limit: Optional[int] = DEFAULT_WORKER_MEMORY_LIMIT):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        # 每个工作进程的内存上限（MB），None表示不限制
+        self.memory_limit = memory_limit
+        self.executor = None
+        self.servers = []
+        # 缓存键 -> 求解结果，按最近使用顺序排列
+        self.cache = OrderedDict()
+        # 缓存键 -> 正在求解的Future，相同请求等待同一个Future
+        self.in_flight = {}
+        self.stats = {"requests": 0, "solved": 0, "cache_hits": 0, "coalesced": 0, "errors": 0, "solve_time": 0.0,
+                      "pool_restarts": 0}
+
+    async def start(self, address=None):
+        """
+        启动进程池并开始监听
+        :param address: Unix套接字路径或(主机, 端口)，默认见default_address
+        """
+        address = address or default_address()
+        if isinstance(address, str):
+            # 先检查地址，已有服务在运行时不必启动进程池
+            remove_stale_socket(address)
+        self.executor = self.create_executor()
+        # 预热：让每个工作进程都启动并完成导入
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _ping) for _ in range(self.workers)))
+        if isinstance(address, str):
+            server = await asyncio.start_unix_server(self.handle_connection, path=address, limit=MAX_REQUEST_BYTES)
+        else:
+            server = await asyncio.start_server(self.handle_connection, *address, limit=MAX_REQUEST_BYTES)
+        self.servers.append(server)
+        return server
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                   initargs=(self.memory_limit,))
+
+    def restart_pool(self, broken: ProcessPoolExecutor):
+        """
+        某个工作进程异常退出（例如被系统结束）后进程池不能再使用，换一个新的进程池
+        同一个进程池上进行中的搜索都会失败，只在第一次发现时重建
+        :param broken: 失败的请求提交到的进程池
+        """
+        if self.executor is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.executor = self.create_executor()
+        # 进行中的搜索都已随旧进程池失败，之后的相同请求重新提交
+        self.in_flight.clear()
+        self.stats["pool_restarts"] += 1
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            # 不等待进行中的搜索：取消排队的请求并结束工作进程（ProcessPoolExecutor没有公开的进程列表）
+            processes = list(executor._processes.values())
+            executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+            # 工作进程结束后很快返回，在线程中回收进程池，不阻塞事件循环
+            await asyncio.to_thread(executor.shutdown)
+
+    async def solve(self, request: Dict) -> Dict:
+        """
+        处理一个求解请求：命中缓存直接返回，相同请求正在求解时合并，否则提交到进程池
+        :param request: 请求字典
+        :return: 响应字典
+        """
+        self.stats["requests"] += 1
+        cells, targets, state_limit, key = parse_request(request)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return dict(result, cached=True, coalesced=False)
+        future = self.in_flight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            self.stats["coalesced"] += 1
+        else:
+            loop = asyncio.get_running_loop()
+            executor = self.executor
+            future = loop.run_in_executor(executor, _solve_in_worker, cells, targets, state_limit)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done, executor))
+        # shield：某个客户端断开时不取消其他客户端共用的搜索
+        result = await asyncio.shield(future)
+        return dict(result, cached=False, coalesced=coalesced)
+
+    def _finish(self, key, future, executor):
+        # 搜索结束：移出进行中的请求（进程池重建后同一键可能已是新的搜索），成功的结果写入缓存
+        if self.in_flight.get(key) is future:
+            del self.in_flight[key]
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.restart_pool(executor)
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        self.stats["solved"] += 1
+        self.stats["solve_time"] += result["solve_time"]
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def respond(self, request) -> Dict:
+        # 分派请求，错误转换为错误响应
+        try:
+            if not isinstance(request, dict):
+                raise ValueError("请求必须是JSON对象")
+            if request.get("command") == "stats":
+                return dict(self.stats, cache_size=len(self.cache), in_flight=len(self.in_flight), workers=self.workers)
+            return await self.solve(request)
+        except Exception as e:
+            self.stats["errors"] += 1
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # 一个连接上可以依次发送多个JSON请求；首行是HTTP请求行时按HTTP处理
+        try:
+            first_line = await reader.readline()
+            if first_line.startswith((b"POST ", b"GET ")):
+                await self.handle_http(first_line, reader, writer)
+                return
+            line = first_line
+            while line:
+                if line.strip():
+                    try:
+                        request = json.loads(line)
+                    except ValueError as e:
+                        response = {"error": f"无效的JSON: {e}"}
+                        self.stats["errors"] += 1
+                    else:
+                        response = await self.respond(request)
+                    writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                    await writer.drain()
+                line = await reader.readline()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # 服务关闭时取消进行中的连接：直接断开，不把取消当作连接处理出错打印
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http(self, request_line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # 最简单的HTTP/1.1处理：每个连接一个请求，响应后关闭
+        method, path = request_line.decode("latin-1").split()[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        status = "200 OK"
+        if method == "GET" and path == "/stats":
+            response = await self.respond({"command": "stats"})
+        elif method == "POST" and path == "/solve":
+            length = headers.get("content-length", "0")
+            if not length.isdecimal():
+                status, response = "400 Bad Request", {"error": f"无效的Content-Length: {length}"}
+            elif int(length) > MAX_REQUEST_BYTES:
+                status, response = "413 Payload Too Large", {"error": "请求过大"}
+            else:
+                try:
+                    request = json.loads(await reader.readexactly(int(length)))
+                except ValueError as e:
+                    status, response = "400 Bad Request", {"error": f"无效的JSON: {e}"}
+                else:
+                    response = await self.respond(request)
+                    if "error" in response:
+                        status = "400 Bad Request"
+        else:
+            status, response = "404 Not Found", {"error": f"未知的路径: {method} {path}"}
+        body = json.dumps(response, ensure_ascii=False).encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+
+class SolverClient:
+    """
+    求解服务的同步客户端，保持一个连接依次发送请求
+    服务未启动时连接失败抛出OSError，调用方可以退回到本进程内求解
+    """
+    def __init__(self, address=None, timeout: float = DEFAULT_CLIENT_TIMEOUT):
+        self.address = address or default_address()
+        self.timeout = timeout
+        self.sock = None
+        self.file = None
+
+    def connect(self):
+        if self.sock is not None:
+            return
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.address)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    def close(self):
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = self.file = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def request(self, request: Dict) -> Dict:
+        # 发送一个请求并等待响应；服务返回错误时抛出ServiceError
+        self.connect()
+        try:
+            self.sock.sendall(json.dumps(request).encode() + b"\n")
+            line = self.file.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("求解服务关闭了连接")
+        response = json.loads(line)
+        if "error" in response:
+            raise ServiceError(response["error"])
+        return response
+
+    def solve(self, cells: List[List[int]], targets, state_limit: Optional[int] = None) -> Dict:
+        """
+        请求求解
+        :param cells: 棋盘格子（99为墙体）
+        :param targets: 起点和终点
+        :param state_limit: 访问状态数上限
+        :return: 响应字典，solution为[[方块编号, 方向], ...]或None
+        """
+        request = {"board": cells, "targets": [list(point) for point in targets]}
+        if state_limit is not None:
+            request["state_limit"] = state_limit
+        return self.request(request)
+
+    def get_stats(self) -> Dict:
+        return self.request({"command": "stats"})
+
+
+def solve_with_service(solver, address=None, on_progress: Optional[Callable[[Dict], None]] = None):
+    """
+    优先通过本地求解服务求解，服务没有运行（连接被拒绝或套接字文件不存在）时在本进程内用solver求解
+    求解计时（format_solution中显示）包含请求的往返时间
+    服务返回错误、超时未响应或中途断开时抛出ServiceError，不再重新求解，由调用方提示用户
+    :param solver: 已用棋盘创建的Solver
+    :param address: 服务地址，默认见default_address
+    :param on_progress: 进度回调，参数为进度事件（见progress）；只在本进程内求解时调用，
+                        服务端的结果可能来自缓存或与其他请求合并，不转发进度
+    :return: 与Solver.solve相同
+    """
+    board = solver.board
+    solver.start_solve_timer()
+    client = SolverClient(address)
+    try:
+        client.connect()
+    except (ConnectionRefusedError, FileNotFoundError):
+        if on_progress is None:
+            return solver.solve()
+        for event in solver.iter_solve():
+            if event["type"] == "progress":
+                on_progress(event)
+        return event["solution"]
+    try:
+        with client:
+            response = client.solve(board.cells, board.targets, solver.state_limit)
+    except socket.timeout as e:
+        raise ServiceError(f"求解服务在{client.timeout:.0f}秒内没有响应") from e
+    except ServiceError:
+        raise
+    except (OSError, ValueError) as e:
+        raise ServiceError(f"与求解服务通信失败: {e}") from e
+    finally:
+        solver.stop_solve_timer()
+    solver.limit_reached = response["limit_reached"]
+    solver.stats = response["stats"]
+    if response["solution"] is None:
+        return None
+    return [tuple(step) for step in response["solution"]]
+
+
+async def serve(address, workers: Optional[int], cache_size: int, memory_limit: Optional[int]):
+    service = SolverService(workers, cache_size, memory_limit)
+    server = await service.start(address)
+    print(f"求解服务已启动: {address}，工作进程数: {service.workers}")
+    # 收到SIGTERM/SIGINT时正常退出，关闭进程池，避免留下孤立的工作进程
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, task.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await service.close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地华容道求解服务")
+    parser.add_argument("--socket", default=None, help=f"Unix套接字路径，默认 {DEFAULT_SOCKET_PATH}")
+    parser.add_argument("--port", type=int, default=None, help="改为监听本机TCP端口（同时接受HTTP请求）")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="TCP监听地址")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认CPU核数")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="结果缓存条目数")
+    parser.add_argument("--memory-limit", type=int, default=DEFAULT_WORKER_MEMORY_LIMIT,
+                        help="每个工作进程的内存上限（MB），0表示不限制")
+    args = parser.parse_args()
+    if args.port is not None:
+        address = (args.host, args.port)
+    else:
+        address = args.socket or default_address()
+    try:
+        asyncio.run(serve(address, args.workers, args.cache_size, args.memory_limit or None))
+    except KeyboardInterrupt:
+        sys.exit(0)
+    except OSError as e:
+        print(f"求解服务启动失败: {e}")
+        sys.exit(1)
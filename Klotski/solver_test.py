@@ -1,27 +1,184 @@
 import time
 import sys
 import os
-import pygame
+import argparse
+import multiprocessing
 
-# 添加项目根目录到Python路径
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 添加项目目录到Python路径，求解器模块之间使用同级导入
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from board import Board
+from solver import Solver
+
+try:
+    import resource
+except ImportError:
+    # Windows没有resource模块，只能强制超时，不能限制内存
+    resource = None
+
+# 默认的单个案例时间限制（秒）和内存上限（MB）
+DEFAULT_TIME_LIMIT = 30
+DEFAULT_MEMORY_LIMIT = 2048
+
+# 求解引擎：bfs为solver.Solver，astar为correct_solver.solve_puzzle
+ENGINES = ("bfs", "astar")
+
+# 测试案例表：名称、棋盘（-1为墙体）、起点、终点、预期是否有解、时间限制（秒），可选的求解引擎（默认bfs）；
+# slow为True的案例耗时较长，默认不运行，run_cases(include_slow=True)或命令行--slow时才运行
+SAMPLE_CASES = [
+    {
+        "name": "简单的3x3棋盘，有解",
+        "board": [
+            [1, 1, 0],
+            [0, 0, 0],
+            [0, 0, 0]
+        ],
+        "start": (0, 2),
+        "end": (2, 2),
+        "expected": True,
+        "time_limit": DEFAULT_TIME_LIMIT,
+    },
+    {
+        "name": "4x4棋盘，有墙体",
+        "board": [
+            [1, 1, 1, 0],
+            [0, 0, 0, 0],
+            [-1, -1, -1, 2],
+            [0, 0, 0, 0]
+        ],
+        "start": (0, 0),
+        "end": (3, 3),
+        "expected": True,
+        "time_limit": DEFAULT_TIME_LIMIT,
+    },
+    {
+        "name": "起点和终点被方块占据",
+        "board": [
+            [3, 0, 0],
+            [3, 1, 0],
+            [0, 0, 2]
+        ],
+        "start": (0, 0),
+        "end": (2, 2),
+        "expected": True,
+        "time_limit": DEFAULT_TIME_LIMIT,
+    },
+    {
+        "name": "复杂棋盘1，有解",
+        "board": [
+            [1, 1, 1, 1, 2, 3],
+            [1, 4, 0, 1, 5, 0],
+            [1, 1, 0, 1, 5, 0],
+            [6, 7, 0, 6, 0, 0],
+            [6, 6, 6, 6, 0, 0]
+        ],
+        "start": (4, 0),
+        "end": (2, 5),
+        "expected": True,
+        "time_limit": 100,
+        "slow": True,
+    },
+    {
+        "name": "复杂棋盘2，有墙体",
+        "board": [
+            [-1, -1, 1, 2, -1, -1],
+            [3, 1, 1, 2, 2, 5],
+            [3, 4, 4, 0, 6, 6],
+            [0, 4, 0, 0, 0, 0],
+            [7, 8, 9, 9, 10, 11],
+            [7, 9, 9, 10, 10, 11]
+        ],
+        "start": (3, 0),
+        "end": (3, 5),
+        "expected": True,
+        "time_limit": 100,
+    },
+    {
+        # 回归案例：开阔棋盘上起点到终点的简单路径数呈指数增长，A*不能在搜索前枚举全部路径
+        "name": "开阔的6x6棋盘，A*",
+        "board": [
+            [1, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0]
+        ],
+        "start": (0, 0),
+        "end": (5, 5),
+        "expected": True,
+        "time_limit": 10,
+        "engine": "astar",
+    },
+]
+
+
+def get_peak_rss():
+    # 本进程的峰值常驻内存（字节），无法获取时返回None；Linux上ru_maxrss的单位为KB，macOS上为字节
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _solve_astar(cells, targets):
+    # 用A*求解，返回(解, 格式化的解)；correct_solver中墙体为-1，不打印性能分析
+    import io
+    import contextlib
+    from correct_solver import solve_puzzle
+    board = [[-1 if value == 99 else value for value in row] for row in cells]
+    with contextlib.redirect_stdout(io.StringIO()):
+        solution = solve_puzzle(board, targets[0], targets[1])[0]
+    if not solution:
+        return solution, None if solution is None else "初始状态已经是目标状态，无需移动"
+    return solution, "\n".join(f"{block}{direction}" for block, direction in solution)
+
+
+def _solve_in_child(conn, cells, targets, memory_limit, engine="bfs"):
+    """
+    子进程入口：限制内存后求解，把结果通过管道发回父进程
+    结果为(状态, 是否有解, 格式化的解, 求解时间, 峰值内存)，状态为"ok"、"memory"或"error"
+    """
+    if resource is not None and memory_limit is not None:
+        # Linux不强制RLIMIT_RSS，用地址空间上限代替：超过时分配失败，抛出MemoryError
+        limit = memory_limit * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    start_time = time.time()
+    try:
+        if engine == "astar":
+            solution, formatted_solution = _solve_astar(cells, targets)
+        else:
+            solver = Solver(Board(len(cells), len(cells[0]), cells, targets))
+            solution = solver.solve()
+            formatted_solution = None
+            if solution == []:
+                formatted_solution = "初始状态已经是目标状态，无需移动"
+            elif solution is not None:
+                formatted_solution = solver.format_solution(solution)
+        result = ("ok", solution is not None, formatted_solution, time.time() - start_time, get_peak_rss())
+    except MemoryError:
+        result = ("memory", False, None, time.time() - start_time, get_peak_rss())
+    except Exception as e:
+        result = ("error", False, f"{type(e).__name__}: {e}", time.time() - start_time, get_peak_rss())
+    conn.send(result)
+    conn.close()
 
-from Klotski.game import Game
-from Klotski.solver import Solver
 
 class SolverTester:
-    def __init__(self):
-        # 初始化测试器
-        pass
-    
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT):
+        # 每个案例在独立的子进程中求解：超时强制结束子进程，内存上限memory_limit（MB，None表示不限制）
+        self.memory_limit = memory_limit
+        # 已运行案例的记录，见run_case
+        self.results = []
+
     def convert_input_board(self, input_board):
         """将用户输入的棋盘格式转换为Game类需要的格式
-        
+
         用户输入格式：
         - 1~81: 代表所属方块
         - 0: 空位
         - -1: 墙体
-        
+
         转换为Game类格式：
         - 1~81: 保持不变
         - 0: 保持不变
@@ -29,16 +186,16 @@ class SolverTester:
         """
         rows = len(input_board)
         cols = len(input_board[0]) if rows > 0 else 0
-        
+
         # 初始化转换后的棋盘
         converted_board = []
-        
+
         # 遍历用户输入的棋盘
         for i in range(rows):
             new_row = []
             for j in range(cols):
                 cell = input_board[i][j]
-                
+
                 if cell == -1:
                     # 墙体转换为99
                     new_row.append(99)
@@ -46,171 +203,122 @@ class SolverTester:
                     # 其他值保持不变
                     new_row.append(cell)
             converted_board.append(new_row)
-        
+
         return converted_board
-    
-    def test_solver(self, input_board, start_point=None, end_point=None, enable_graphics=False, time_limit=30):
-        """测试求解器并输出结果和时间
-        
-        参数:
-        input_board: 用户提供的二维数组，表示初始棋盘状态
-        start_point: 起点坐标，格式为(i, j)，默认为(0, 0)
-        end_point: 终点坐标，格式为(i, j)，默认为(rows-1, cols-1)
-        enable_graphics: 是否启用图形界面（默认为False，仅用于测试）
-        time_limit: 求解时间限制（秒），默认为30秒
-        
+
+    def run_case(self, input_board, start_point=None, end_point=None, time_limit=DEFAULT_TIME_LIMIT, engine="bfs"):
+        """在子进程中求解一个案例，超过time_limit秒时强制结束子进程，engine见ENGINES
+
         返回:
-        tuple: (是否有解, 解步骤列表, 求解时间(秒))
+        dict: {"status": "ok"/"timeout"/"memory"/"crash"/"error", "has_solution", "solution",
+               "solve_time"（秒）, "peak_rss"（子进程峰值常驻内存，字节，未知时为None）}
         """
-        # 确保pygame已初始化
-        if not pygame.get_init():
-            pygame.init()
-            
-            # 如果不需要图形界面，可以设置为无头模式
-            if not enable_graphics:
-                os.environ['SDL_VIDEODRIVER'] = 'dummy'
-                pygame.display.set_mode((1, 1))
-        
         # 转换用户输入的棋盘格式
         converted_board = self.convert_input_board(input_board)
-        
+
         # 获取棋盘大小
         rows = len(converted_board)
         cols = len(converted_board[0]) if rows > 0 else 0
-        
+
         # 设置默认起点和终点
         if start_point is None:
             start_point = (0, 0)
         if end_point is None:
             end_point = (rows-1, cols-1)
-        
-        # 设置targets
         targets = [start_point, end_point]
-        
-        # 创建Game实例
-        game = Game((rows, cols), board=converted_board, targets=targets, mode="solve")
-        
-        # 创建Solver实例
-        solver = Solver(game)
-        
-        # 记录开始时间
+        if engine not in ENGINES:
+            raise ValueError(f"未知的求解引擎: {engine}，可选值: {ENGINES}")
+
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_solve_in_child, daemon=True,
+                                          args=(sender, converted_board, targets, self.memory_limit, engine))
         start_time = time.time()
-        
-        # 使用BFS暴力搜索算法求解
-        solution = None
+        process.start()
+        sender.close()
         try:
-            solution = solver.solve()
-        except KeyboardInterrupt:
-            print("求解被用户中断")
-            return False, "求解被用户中断", time.time() - start_time
-        
-        # 记录结束时间
-        end_time = time.time()
-        solve_time = end_time - start_time
-        
-        # 检查是否超时
-        if solve_time > time_limit:
-            return False, f"求解超时（超过{time_limit}秒）", solve_time
-        
-        # 检查是否有解
-        # 修改检查逻辑：空列表表示初始状态已经是目标状态，也是有解的
-        has_solution = solution is not None
-        
-        # 格式化解决方案
-        formatted_solution = None
-        if has_solution:
-            if solution == []:
-                formatted_solution = "初始状态已经是目标状态，无需移动"
+            if receiver.poll(time_limit):
+                status, has_solution, solution, solve_time, peak_rss = receiver.recv()
             else:
-                formatted_solution = solver.format_solution(solution)
-        
-        return has_solution, formatted_solution, solve_time
-        
-    # 移除了test_solver_connectivity方法，因为我们只保留BFS算法
+                # 超时：强制结束子进程，不等待搜索自行结束
+                status, has_solution, solution, solve_time, peak_rss = (
+                    "timeout", False, f"求解超时（超过{time_limit}秒）", time.time() - start_time, None)
+        except EOFError:
+            # 子进程没有发回结果就退出（例如被系统因内存不足结束）
+            status, has_solution, solve_time, peak_rss = "crash", False, time.time() - start_time, None
+            solution = None
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+        if status == "crash":
+            solution = f"求解进程异常退出（退出码 {process.exitcode}）"
+        elif status == "memory":
+            solution = f"求解超过内存上限（{self.memory_limit} MB）"
+        return {"status": status, "has_solution": has_solution, "solution": solution,
+                "solve_time": solve_time, "peak_rss": peak_rss}
+
+    def test_solver(self, input_board, start_point=None, end_point=None, enable_graphics=False,
+                    time_limit=DEFAULT_TIME_LIMIT):
+        """测试求解器并输出结果和时间
+
+        参数:
+        input_board: 用户提供的二维数组，表示初始棋盘状态
+        start_point: 起点坐标，格式为(i, j)，默认为(0, 0)
+        end_point: 终点坐标，格式为(i, j)，默认为(rows-1, cols-1)
+        enable_graphics: 保留的兼容参数，求解器已不依赖pygame，该参数不再生效
+        time_limit: 求解时间限制（秒），默认为30秒，超时时强制结束求解子进程
+
+        返回:
+        tuple: (是否有解, 解步骤列表或失败原因, 求解时间(秒))
+        """
+        result = self.run_case(input_board, start_point, end_point, time_limit)
+        return result["has_solution"], result["solution"], result["solve_time"]
+
+    def run_cases(self, cases=SAMPLE_CASES, include_slow=False):
+        """依次运行案例表中的案例，记录每个案例的结果、耗时和峰值内存，include_slow为False时跳过slow案例
+
+        返回:
+        list: 每个案例的记录（run_case的结果，另含"name"和"passed"），同时追加到self.results
+        """
+        records = []
+        for case in select_cases(cases, include_slow):
+            result = self.run_case(case["board"], case["start"], case["end"],
+                                   case.get("time_limit", DEFAULT_TIME_LIMIT), case.get("engine", "bfs"))
+            result["name"] = case["name"]
+            result["passed"] = result["status"] == "ok" and result["has_solution"] == case["expected"]
+            records.append(result)
+        self.results.extend(records)
+        return records
+
+
+def select_cases(cases, include_slow=False):
+    # 按是否包含耗时较长的案例筛选案例表
+    return [case for case in cases if include_slow or not case.get("slow")]
+
+
+def format_record(record):
+    # 单个案例记录的一行描述
+    memory = "未知" if record["peak_rss"] is None else f"{record['peak_rss'] / 1024 / 1024:.1f} MB"
+    outcome = "通过" if record["passed"] else f"失败（{record['status']}）"
+    return f"{outcome}  {record['name']}: 有解 {record['has_solution']}，用时 {record['solve_time']:.4f} 秒，峰值内存 {memory}"
+
 
-# 示例用法
+# 示例用法：运行示例案例（--slow时包含耗时较长的案例），有失败的案例时以非零状态退出
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在独立子进程中运行求解器测试案例")
+    parser.add_argument("--slow", action="store_true", help="同时运行耗时较长的案例")
+    args = parser.parse_args()
+    cases = select_cases(SAMPLE_CASES, args.slow)
     tester = SolverTester()
-    
-    # 示例1: 简单的3x3棋盘，有解
-    print("===== 示例1: 简单的3x3棋盘，有解 =====")
-    sample_board1 = [
-        [1, 1, 0],
-        [0, 0, 0],
-        [0, 0, 0]
-    ]
-    start_point1 = (0, 2)  # 起点坐标
-    end_point1 = (2, 2)    # 终点坐标
-    has_solution1, solution1, time1 = tester.test_solver(sample_board1, start_point1, end_point1)
-    print(f"有解: {has_solution1}")
-    print(f"求解时间: {time1:.4f}秒")
-    if has_solution1:
-        print(f"解决方案:\n{solution1}")
-    print()
-    
-    # 示例2: 4x4棋盘，有墙体
-    print("===== 示例2: 4x4棋盘，有墙体 =====")
-    sample_board2 = [
-        [1, 1, 1, 0],
-        [0, 0, 0, 0],
-        [-1, -1, -1, 2],
-        [0, 0, 0, 0]
-    ]
-    start_point2 = (0, 0)  # 起点坐标
-    end_point2 = (3, 3)    # 终点坐标
-    has_solution2, solution2, time2 = tester.test_solver(sample_board2, start_point2, end_point2)
-    print(f"有解: {has_solution2}")
-    print(f"求解时间: {time2:.4f}秒")
-    if has_solution2:
-        print(f"解决方案:\n{solution2}")
-    print()
-    
-    # 示例3: 起点和终点被方块占据的情况
-    print("===== 示例3: 起点和终点被方块占据的情况 =====")
-    sample_board3 = [
-        [3, 0, 0],
-        [3, 1, 0],
-        [0, 0, 2]
-    ]
-    start_point3 = (0, 0)  # 起点坐标（被方块3占据）
-    end_point3 = (2, 2)    # 终点坐标（被方块2占据）
-    has_solution3, solution3, time3 = tester.test_solver(sample_board3, start_point3, end_point3)
-    print(f"有解: {has_solution3}")
-    print(f"求解时间: {time3:.4f}秒")
-    if has_solution3:
-        print(f"解决方案:\n{solution3}")
-    
-    # 测试复杂案例（使用BFS算法）
-    print("\n\n========== 测试复杂案例 ==========")
-    
-    # 复杂的棋盘
-    print("\n===== 复杂棋盘1，有解 =====")
-    sample_board_complex = [
-        [1, 1, 1, 1, 2, 3],
-        [1, 4, 0, 1, 5, 0],
-        [1, 1, 0, 1, 5, 0],
-        [6, 7, 0, 6, 0, 0],
-        [6, 6, 6, 6, 0, 0]
-    ]
-    start_point_complex = (4, 0)  # 起点坐标
-    end_point_complex = (2, 5)    # 终点坐标
-    
-    # 测试复杂棋盘
-    sample_board_complex = [
-        [-1, -1, 1, 2, -1, -1],
-        [3, 1, 1, 2, 2, 5],
-        [3, 4, 4, 0, 6, 6],
-        [0, 4, 0, 0, 0, 0],
-        [7, 8, 9, 9, 10, 11],
-        [7, 9, 9, 10, 10, 11]
-    ]
-    start_point_complex = (3, 0)  # 起点坐标
-    end_point_complex = (3, 5)    # 终点坐标
-
-    print("\n使用BFS暴力搜索算法求解（时间限制30秒）...")
-    has_solution_bfs, solution_bfs, time_bfs = tester.test_solver(
-        sample_board_complex, start_point_complex, end_point_complex, time_limit=100)
-    print(f"有解: {has_solution_bfs}")
-    print(f"求解时间: {time_bfs:.4f}秒")
-    if has_solution_bfs:
-        print(f"解决方案:\n{solution_bfs}")
\ No newline at end of file
+    failed = 0
+    for case in cases:
+        print(f"===== {case['name']} =====")
+        record = tester.run_cases([case], include_slow=True)[0]
+        print(format_record(record))
+        if record["has_solution"] or record["status"] != "ok":
+            print(f"{'解决方案' if record['has_solution'] else '原因'}:\n{record['solution']}")
+        print()
+        failed += not record["passed"]
+    print(f"共 {len(cases)} 个案例，失败 {failed} 个，跳过 {len(SAMPLE_CASES) - len(cases)} 个耗时较长的案例")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,61 @@
+# 文本渲染缓存文件
+# 字体只解析一次，相同字体、字号、文字和颜色的文本表面只渲染一次
+from constants import get_font, FONT_NAMES, DEFAULT_FONT_SIZE
+
+# 缓存表面数量上限，超过后整体清空，防止不断变化的文本撑大缓存
+MAX_CACHED_SURFACES = 2048
+
+
+class TextCache:
+    def __init__(self, max_surfaces: int = MAX_CACHED_SURFACES):
+        # (字体名称, 字号) -> 字体对象
+        self.fonts = {}
+        # (字体名称, 字号, 文字, 颜色) -> 渲染好的表面
+        self.surfaces = {}
+        # 作用域 -> 属于该作用域的缓存键集合，用于按作用域淘汰
+        self.scopes = {}
+        self.max_surfaces = max_surfaces
+
+    def get_font(self, size=DEFAULT_FONT_SIZE, names=FONT_NAMES):
+        # 获取字体，同一字体和字号只做一次系统字体查找
+        key = (names, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = get_font(size, names)
+            self.fonts[key] = font
+        return font
+
+    def render(self, text, color, size=DEFAULT_FONT_SIZE, names=FONT_NAMES, scope=None):
+        """
+        获取渲染好的文本表面
+        :param text: 文本内容
+        :param color: 文本颜色
+        :param size: 字号
+        :param names: 字体名称
+        :param scope: 缓存作用域，如"solution"、"level"，可通过evict按作用域淘汰
+        :return: 文本表面
+        """
+        key = (names, size, text, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if len(self.surfaces) >= self.max_surfaces:
+                self.clear()
+            surface = self.get_font(size, names).render(text, True, color)
+            self.surfaces[key] = surface
+            if scope is not None:
+                self.scopes.setdefault(scope, set()).add(key)
+        return surface
+
+    def evict(self, scope):
+        # 淘汰指定作用域内的所有缓存表面（求解结果或关卡变化时调用）
+        for key in self.scopes.pop(scope, ()):
+            self.surfaces.pop(key, None)
+
+    def clear(self):
+        # 清空所有缓存表面，字体对象保留
+        self.surfaces.clear()
+        self.scopes.clear()
+
+
+# 全局共享的文本缓存
+text_cache = TextCache()
@@ -1,4 +1,5 @@
 # 工具函数文件
+import hashlib
 from typing import List, Tuple, Set, FrozenSet, Optional
 
 
@@ -29,7 +30,15 @@ def get_block_shape(board: List[List[int]], block_number: int, rows: int, cols:
     :return: 规范化的形状表示
     """
     positions = get_block_positions(board, block_number, rows, cols)
-    
+    return get_positions_shape(positions)
+
+
+def get_positions_shape(positions: List[Tuple[int, int]]) -> Optional[FrozenSet[Tuple[int, int]]]:
+    """
+    根据方块的位置列表获取形状特征（考虑旋转等价性）
+    :param positions: 方块的位置列表
+    :return: 规范化的形状表示
+    """
     if not positions:
         return None
         
@@ -129,4 +138,85 @@ def calculate_block_bounds(positions: List[Tuple[int, int]]) -> Tuple[int, int,
     min_j = min(pos[1] for pos in positions)
     max_j = max(pos[1] for pos in positions)
     
-    return min_i, max_i, min_j, max_j
\ No newline at end of file
+    return min_i, max_i, min_j, max_j
+
+def format_time(seconds: float, milliseconds: bool = True) -> str:
+    """
+    格式化时间为 分:秒.毫秒
+    :param seconds: 秒数
+    :param milliseconds: 为False时只显示到整秒（分:秒）
+    :return: 格式化后的字符串
+    """
+    minutes = int(seconds // 60)
+    remaining_seconds = seconds % 60
+    seconds_int = int(remaining_seconds)
+    if not milliseconds:
+        return f"{minutes:02d}:{seconds_int:02d}"
+    milliseconds = int((remaining_seconds - seconds_int) * 1000)
+    return f"{minutes:02d}:{seconds_int:02d}.{milliseconds:03d}"
+
+
+def _transform_cell(i: int, j: int, rows: int, cols: int, transform: int) -> Tuple[int, int]:
+    """
+    按二面体群的8种对称变换之一变换坐标
+    :param transform: 0-3为旋转0°/90°/180°/270°，4-7为先水平镜像再旋转
+    :return: 变换后的坐标
+    """
+    if transform >= 4:
+        j = cols - 1 - j
+    rotation = transform % 4
+    if rotation == 0:
+        return i, j
+    if rotation == 1:
+        return j, rows - 1 - i
+    if rotation == 2:
+        return rows - 1 - i, cols - 1 - j
+    return cols - 1 - j, i
+
+
+def canonical_level_form(board: List[List[int]], targets) -> Tuple:
+    """
+    获取关卡的规范形式：对8种对称变换分别按行优先顺序重新编号方块，取最小者
+    方块编号、镜像、旋转以及起点终点互换都不影响规范形式
+    :param board: 游戏棋盘（墙体为99或-1）
+    :param targets: 起点和终点
+    :return: (行数, 列数, 格子元组, 目标点元组)
+    """
+    rows = len(board)
+    cols = len(board[0]) if rows > 0 else 0
+    best = None
+    for transform in range(8):
+        new_rows, new_cols = (cols, rows) if transform % 2 == 1 else (rows, cols)
+        cells = [[0] * new_cols for _ in range(new_rows)]
+        for i in range(rows):
+            for j in range(cols):
+                ni, nj = _transform_cell(i, j, rows, cols, transform)
+                cells[ni][nj] = board[i][j]
+        # 按行优先的首次出现顺序重新编号，墙体统一为-1
+        labels = {}
+        flat = []
+        for row in cells:
+            for value in row:
+                if value in (99, -1):
+                    flat.append(-1)
+                elif value == 0:
+                    flat.append(0)
+                else:
+                    if value not in labels:
+                        labels[value] = len(labels) + 1
+                    flat.append(labels[value])
+        new_targets = tuple(sorted(_transform_cell(t[0], t[1], rows, cols, transform) for t in targets))
+        form = (new_rows, new_cols, tuple(flat), new_targets)
+        if best is None or form < best:
+            best = form
+    return best
+
+
+def canonical_level_hash(board: List[List[int]], targets) -> str:
+    """
+    计算关卡的规范内容哈希，对方块重新编号和棋盘对称变换不敏感
+    :param board: 游戏棋盘
+    :param targets: 起点和终点
+    :return: 十六进制哈希字符串
+    """
+    return hashlib.sha1(repr(canonical_level_form(board, targets)).encode("utf-8")).hexdigest()
@@ -0,0 +1,92 @@
+# Zobrist哈希文件
+# 为每个(格子, 方块编号)分配一个随机64位键，状态的哈希为所有非空格子键的异或，
+# 移动方块时只需异或该方块离开和进入的格子，不必重新哈希整个棋盘
+import random
+from typing import Callable, Dict, List, Tuple
+
+
+class ZobristTable:
+    def __init__(self, rows: int, cols: int, seed: int = 0):
+        self.rows = rows
+        self.cols = cols
+        self.seed = seed
+        # 格子取值 -> 每个格子的随机键，按需生成；空位的键恒为0
+        self.keys: Dict[int, List[int]] = {}
+        # (方块编号, 方块首格位置, 行偏移, 列偏移) -> 哈希增量
+        # 方块形状固定，首格位置确定了方块的全部格子，同一移动只需计算一次
+        self.deltas: Dict[tuple, int] = {}
+
+    def get_keys(self, value: int) -> List[int]:
+        # 获取某个方块编号在各个格子上的随机键
+        keys = self.keys.get(value)
+        if keys is None:
+            # 每个编号使用独立的种子，键与生成顺序无关，同一棋盘大小的哈希可复现
+            rng = random.Random(f"{self.seed}:{value}")
+            keys = [rng.getrandbits(64) for _ in range(self.rows * self.cols)]
+            self.keys[value] = keys
+        return keys
+
+    def hash_state(self, state) -> int:
+        """
+        计算完整状态的哈希，只在搜索开始时调用一次
+        :param state: 棋盘状态（二维列表或元组）
+        :return: 64位哈希值
+        """
+        cols = self.cols
+        h = 0
+        for i, row in enumerate(state):
+            for j, value in enumerate(row):
+                if value != 0:
+                    h ^= self.get_keys(value)[i * cols + j]
+        return h
+
+    def move_delta(self, block: int, positions: List[Tuple[int, int]], di: int, dj: int) -> int:
+        """
+        计算方块整体移动一格引起的哈希变化，代价只与方块大小有关
+        :param block: 方块编号
+        :param positions: 移动前方块的所有位置，按行优先顺序排列
+        :param di: 行偏移
+        :param dj: 列偏移
+        :return: 与原哈希异或即得新状态的哈希
+        """
+        cache_key = (block, positions[0], di, dj)
+        delta = self.deltas.get(cache_key)
+        if delta is None:
+            keys = self.get_keys(block)
+            cols = self.cols
+            delta = 0
+            for i, j in positions:
+                # 移动前后都被方块占据的格子两次异或相互抵消
+                delta ^= keys[i * cols + j] ^ keys[(i + di) * cols + j + dj]
+            self.deltas[cache_key] = delta
+        return delta
+
+
+class ZobristMap:
+    """
+    以Zobrist哈希为键的状态映射，查找时只比较哈希相同的那一个状态，
+    哈希冲突（内容不同但哈希相同）的状态退回到以完整状态为键的字典
+    """
+    def __init__(self, get_state: Callable = None):
+        # 哈希 -> 值；值为状态本身，或通过get_state能取回状态的对象（如节点编号）
+        self.values = {}
+        self.collisions = {}
+        self.get_state = get_state or (lambda value: value)
+
+    def __len__(self):
+        return len(self.values) + len(self.collisions)
+
+    def get(self, h: int, state, default=None):
+        value = self.values.get(h)
+        if value is None:
+            return default
+        if self.get_state(value) == state:
+            return value
+        return self.collisions.get(state, default)
+
+    def set(self, h: int, state, value):
+        existing = self.values.get(h)
+        if existing is None or self.get_state(existing) == state:
+            self.values[h] = value
+        else:
+            self.collisions[state] = value